@@ -1,26 +1,129 @@
-from .summarize_tool import SummarizeTool
-from .write_article_tool import WriteArticleTool
-from .events_finder_tool import EventsFinderTool
-from .summary_validator_agent import SummarizeValidatorAgent
-from .write_article_validator_agent import WriteArticleValidatorAgent
-from .events_finder_validator_agent import EventsFinderValidatorAgent
-from .refiner_agent import RefinerAgent
-from .validator_agent import ValidatorAgent
+import importlib
+import threading
+from .env import load_env
+
+# Module settings are read from the environment at import time, so .env goes first
+load_env()
+
+# Public names and the submodule defining each. They are imported on first access
+# (PEP 562), so `import agents` stays cheap and e.g. numpy or httpx load only when used.
+_EXPORTS = {
+    "SummarizeTool": "summarize_tool",
+    "WriteArticleTool": "write_article_tool",
+    "EventsFinderTool": "events_finder_tool",
+    "SummarizeValidatorAgent": "summary_validator_agent",
+    "WriteArticleValidatorAgent": "write_article_validator_agent",
+    "EventsFinderValidatorAgent": "events_finder_validator_agent",
+    "RefinerAgent": "refiner_agent",
+    "ValidatorAgent": "validator_agent",
+    "ResponseCache": "response_cache",
+    "RateLimiter": "rate_limiter",
+    "MetricsRegistry": "metrics",
+    "Backend": "backends",
+    "BackendRegistry": "backends",
+    "RetrievalIndex": "retrieval_index",
+    "SimilarityCache": "similarity_cache",
+    "Job": "jobs",
+    "JobQueue": "jobs",
+    "ValidationResult": "validation",
+    "parse_validation": "validation",
+    "Pipeline": "pipeline",
+    "Stage": "pipeline",
+    "StageOutput": "pipeline",
+    "StageEvent": "pipeline",
+    "summarize_pipeline": "pipeline",
+    "article_pipeline": "pipeline",
+    "events_pipeline": "pipeline",
+    "final_article": "pipeline",
+}
+
+__all__ = ["AgentManager", "load_env", *_EXPORTS]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    # Cached as a module global, so __getattr__ only runs once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
 
 class AgentManager:
-    def __init__(self,max_retries=2,verbose=True):
-        self.agents = {
-            "summarize": SummarizeTool(max_retries=max_retries,verbose=verbose),
-            "write_article": WriteArticleTool(max_retries=max_retries,verbose=verbose),
-            "historical_events": EventsFinderTool(max_retries = max_retries, verbose = verbose),#...
-            "summarize_validator": SummarizeValidatorAgent(max_retries=max_retries,verbose=verbose),
-            "write_article_validator":WriteArticleValidatorAgent(max_retries=max_retries,verbose=verbose),
-            "historical_events_validator": EventsFinderValidatorAgent(max_retries=max_retries,verbose=verbose),#...
-            "refiner": RefinerAgent(max_retries=max_retries,verbose=verbose),
-            "validator": ValidatorAgent(max_retries=max_retries,verbose=verbose)
-        }
+    """
+    Hands out agents by task name. Agents are built on first use and then reused,
+    so one manager can be shared by every session in the process.
+    """
+
+    # Task name -> agent class name; the class (and its module) is loaded when the agent is first needed
+    AGENT_CLASSES = {
+        "summarize": "SummarizeTool",
+        "write_article": "WriteArticleTool",
+        "historical_events": "EventsFinderTool",
+        "summarize_validator": "SummarizeValidatorAgent",
+        "write_article_validator": "WriteArticleValidatorAgent",
+        "historical_events_validator": "EventsFinderValidatorAgent",
+        "refiner": "RefinerAgent",
+        "validator": "ValidatorAgent"
+    }
+
+    def __init__(self,max_retries=2,verbose=True,cache=None,rate_limiter=None,metrics=None,index=None,similarity_cache=None,
+                 job_db=":memory:",job_workers=2,backends=None):
+        self.max_retries = max_retries
+        self.verbose = verbose
+        self.cache = cache
+        # One limiter for every agent, so the provider quota is shared rather than per agent
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        # BackendRegistry shared by every agent; None uses the one configured from the environment
+        self.backends = backends
+        # Optional RetrievalIndex over uploaded documents, used to ground the events lookups
+        self.index = index
+        # Optional SimilarityCache of whole flow results (output plus validation) for near-duplicate requests
+        self.similarity_cache = similarity_cache
+        self.job_db = job_db
+        self.job_workers = job_workers
+        self._jobs = None
+        self.agents = {}
+        self._lock = threading.Lock()
+
     def get_agent(self,agent_name):
         agent = self.agents.get(agent_name)
-        if not agent:
+        if agent:
+            return agent
+        class_name = self.AGENT_CLASSES.get(agent_name)
+        if not class_name:
             raise ValueError(f"Agent '{agent_name}' not found")
-        return agent
+        with self._lock:
+            # Another session may have built it while we waited for the lock
+            if agent_name not in self.agents:
+                agent_class = class_name if isinstance(class_name, type) else __getattr__(class_name)
+                self.agents[agent_name] = agent_class(
+                    max_retries=self.max_retries,
+                    verbose=self.verbose,
+                    cache=self.cache,
+                    rate_limiter=self.rate_limiter,
+                    metrics=self.metrics,
+                    backends=self.backends
+                )
+            return self.agents[agent_name]
+
+    @property
+    def jobs(self):
+        """Background JobQueue for long pipelines, created on first use"""
+        with self._lock:
+            if self._jobs is None:
+                from .jobs import JobQueue
+                self._jobs = JobQueue(self, db_path=self.job_db, max_workers=self.job_workers)
+            return self._jobs
+
+    def submit_job(self,kind,**params):
+        """Runs a pipeline ("summarize", "article" or "events") in the background; returns the job id"""
+        return self.jobs.submit(kind, **params)
+
+    def get_job(self,job_id):
+        return self.jobs.get(job_id)
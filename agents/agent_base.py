@@ -1,45 +1,334 @@
-import openai
-from groq import Groq
 from abc import ABC, abstractmethod
 from loguru import logger
+import asyncio
+import contextlib
 import os
-from dotenv import load_dotenv
+import queue
+import threading
+import time
+from .backends import get_registry
+from .token_budget import content_text, estimate_tokens, lead_tail, message_tokens
+from .metrics import metrics as default_metrics
+from .rate_limiter import backoff_delay, is_rate_limit_error, retry_after_seconds
+from .response_cache import skip_cache_reads
 
-load_dotenv()
+# Characters of each prompt/reply that make it into the logs; the rest is summarized by its length
+LOG_PREVIEW_CHARS = int(os.getenv("LOG_PREVIEW_CHARS", "300"))
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-client = Groq(api_key=os.environ.get("GROQ_API_KEY"),)
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+def preview(content):
+    """Short, log-friendly form of a message content (string or list of parts)"""
+    content = content_text(content)
+    if len(content) <= LOG_PREVIEW_CHARS:
+        return content
+    return f"{content[:LOG_PREVIEW_CHARS]}... [{len(content)} chars]"
+
+def get_event_loop():
+    """Returns the background event loop that runs every agent coroutine"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="agents-event-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+def run_async(coro):
+    """Schedules a coroutine on the shared loop and returns a concurrent.futures.Future"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+def run_sync(coro):
+    """Runs a coroutine on the shared loop and blocks the calling thread until it finishes"""
+    loop = get_event_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("run_sync cannot be called from the agents event loop, await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+def iterate_sync(agen):
+    """Drives an async generator on the shared loop and yields its items in the calling thread"""
+    items = queue.Queue()
+    finished = object()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put((item, None))
+        except Exception as e:
+            items.put((None, e))
+        finally:
+            items.put((finished, None))
+
+    future = run_async(pump())
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is finished:
+                return
+            yield item
+    finally:
+        # Stops the producer if the consumer walks away early
+        future.cancel()
+
+async def merge_in_order(streams):
+    """
+    Runs async generators concurrently and yields their items one generator after
+    another, in order: the first one streams live while the rest buffer.
+    """
+    queues = [asyncio.Queue() for _ in streams]
+    finished = object()
+
+    async def pump(stream, items):
+        try:
+            async for item in stream:
+                items.put_nowait((item, None))
+            items.put_nowait((finished, None))
+        except Exception as e:
+            items.put_nowait((None, e))
+
+    tasks = [asyncio.ensure_future(pump(stream, items)) for stream, items in zip(streams, queues)]
+    try:
+        for items in queues:
+            while True:
+                item, error = await items.get()
+                if error is not None:
+                    raise error
+                if item is finished:
+                    break
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
 
 class AgentBase(ABC):
-    def __init__(self,name,max_retries=2,verbose=True):
+    def __init__(self,name,max_retries=2,verbose=True,cache=None,rate_limiter=None,metrics=None,backends=None):
       self.name = name
       self.max_retries = max_retries
       self.verbose = verbose
+      self.cache = cache
+      self.rate_limiter = rate_limiter
+      self.metrics = metrics if metrics is not None else default_metrics
+      # BackendRegistry picking the model for this agent and the endpoint for each call
+      self.backends = backends if backends is not None else get_registry()
+      self.model_name = self.backends.model_for(name, self.model)
+
+    # Sampling settings used by aexecute/stream_execute; subclasses override them
+    temperature = 0.5
+    max_tokens = 350
+    # Preferred model; None uses the registry default. LLM_AGENT_MODELS overrides either
+    model = None
+    # Upper bound on the estimated prompt size; build_messages compresses inputs to stay under it
+    input_token_budget = 6000
+    # Structured reply format for the API (e.g. {"type": "json_object"}); None for free text
+    response_format = None
 
     @abstractmethod
-    def execute(self,*args,**kwargs):
+    def build_messages(self,*args,**kwargs):
         pass
 
-    def call_openai(self,messages,temperature=0.5,max_tokens=350):
+    def input_room(self,*fixed_texts,reserve=200):
+        """Tokens left in input_token_budget for compressible input after fixed_texts and reserve (instructions)"""
+        return max(1, self.input_token_budget - reserve - sum(estimate_tokens(text) for text in fixed_texts if text))
+
+    def fit_messages(self,messages):
+        """
+        Last-resort guard for input_token_budget: when the prompt is still too large,
+        the longest text in it is cut to its beginning and end.
+        """
+        excess = message_tokens(messages) - self.input_token_budget
+        if excess <= 0:
+            return messages
+        messages = [dict(msg) for msg in messages]
+        longest = None
+        for i, msg in enumerate(messages):
+            parts = msg["content"] if isinstance(msg["content"], list) else [msg["content"]]
+            for j, part in enumerate(parts):
+                text = part.get("text", "") if isinstance(part, dict) else str(part)
+                if longest is None or len(text) > len(longest[2]):
+                    longest = (i, j, text)
+        i, j, text = longest
+        fitted = lead_tail(text, max(1, estimate_tokens(text) - excess))
+        if isinstance(messages[i]["content"], list):
+            messages[i]["content"] = [dict(part, text=fitted) if k == j else part for k, part in enumerate(messages[i]["content"])]
+        else:
+            messages[i]["content"] = fitted
+        logger.warning(f"[{self.name}] prompt over the {self.input_token_budget} token budget by {excess}, trimmed")
+        return messages
+
+    def parse_reply(self,reply):
+        """Turns the model's reply into aexecute's result; validators parse it into a ValidationResult"""
+        return reply
+
+    async def aexecute(self,*args,**kwargs):
+        reply = await self.acall(self.fit_messages(self.build_messages(*args,**kwargs)),temperature=self.temperature,
+                                 max_tokens=self.max_tokens,response_format=self.response_format)
+        return self.parse_reply(reply)
+
+    def execute(self,*args,**kwargs):
+        return run_sync(self.aexecute(*args,**kwargs))
+
+    async def astream_execute(self,*args,**kwargs):
+        async for chunk in self.astream(self.fit_messages(self.build_messages(*args,**kwargs)),temperature=self.temperature,
+                                        max_tokens=self.max_tokens,response_format=self.response_format):
+            yield chunk
+
+    def stream_execute(self,*args,**kwargs):
+        return iterate_sync(self.astream_execute(*args,**kwargs))
+
+    def call_model(self,messages,temperature=0.5,max_tokens=350,response_format=None):
+        return run_sync(self.acall(messages,temperature=temperature,max_tokens=max_tokens,response_format=response_format))
+
+    # Old name, from when every call went to OpenAI
+    call_openai = call_model
+
+    def _cache_lookup(self,messages,temperature,max_tokens):
+        if self.cache is None or not self.cache.should_cache(temperature):
+            return None, None
+        cache_key = self.cache.make_key(self.model_name, messages, temperature, max_tokens)
+        if skip_cache_reads.get():
+            return cache_key, None
+        cached = self.cache.get(cache_key)
+        if cached is not None and self.verbose:
+            logger.info(f"[{self.name}] served response from cache")
+        return cache_key, cached
+
+    def _log_request(self,messages):
+        if self.verbose:
+            logger.info(f"[{self.name}] sends message to {self.model_name}")
+            for msg in messages:
+                 logger.debug(f" {msg['role']}: {preview(msg['content'])}")
+
+    def _request_slot(self,messages,max_tokens):
+        if self.rate_limiter is None:
+            return contextlib.nullcontext()
+        return self.rate_limiter.slot(message_tokens(messages) + max_tokens)
+
+    async def _after_failure(self,error,retries):
+        # Retry hints only count for 429s; other failures (a 503, a timeout) use plain backoff
+        rate_limited = is_rate_limit_error(error)
+        retry_after = retry_after_seconds(error) if rate_limited else None
+        if self.rate_limiter is not None and rate_limited:
+            self.rate_limiter.on_rate_limited(retry_after)
+        logger.error(f"[{self.name}] error during model call: {error}. Retry {retries}/{self.max_retries}")
+        if retries < self.max_retries:
+            await asyncio.sleep(backoff_delay(retries, retry_after))
+
+    @staticmethod
+    def _request_params(temperature,max_tokens,response_format):
+        params = dict(temperature=temperature,max_tokens=max_tokens)
+        if response_format is not None:
+            params["response_format"] = response_format
+        return params
+
+    async def acall(self,messages,temperature=0.5,max_tokens=350,response_format=None):
+        started = time.perf_counter()
+        cache_key, cached = self._cache_lookup(messages,temperature,max_tokens)
+        if cached is not None:
+            self.metrics.record_cache_hit(self.name)
+            return cached
         retries = 0
+        queue_wait = 0.0
         while retries < self.max_retries:
             try:
-                if self.verbose:
-                    logger.info(f"[{self.name}] sends message to OpenAI")
-                    for msg in messages:
-                         logger.debug(f" {msg['role']}: {msg['content']}")
-                response = client.chat.completions.create(
-                    model = "llama-3.3-70b-versatile",
-                    messages= messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens
-                )
+                self._log_request(messages)
+                queued = time.perf_counter()
+                async with self._request_slot(messages,max_tokens):
+                    queue_wait += time.perf_counter() - queued
+                    backend, response = await self.backends.acomplete(
+                        self.model_name,
+                        messages,
+                        **self._request_params(temperature,max_tokens,response_format)
+                    )
+                if self.rate_limiter is not None:
+                    self.rate_limiter.on_success()
                 reply = response.choices[0].message.content
+                self._record_call(started, queue_wait, None, response.usage, retries)
                 if self.verbose:
-                    logger.info(f"[{self.name} received response: {reply}]")
+                    logger.info(f"[{self.name} received response from {backend.name}: {preview(reply)}]")
+                if cache_key is not None:
+                    self.cache.set(cache_key, reply)
                 return reply
             except Exception as e:
                 retries += 1
-                logger.error(f"[{self.name}] error During OpenAI call: {e}.Retry {retries}/{self.max_retries}")
-        raise Exception(f"[{self.name}] Failed to get response from OpenAI after {self.max_retries} retries.")
-         
+                await self._after_failure(e,retries)
+        self._record_call(started, queue_wait, None, None, retries, error=True)
+        raise Exception(f"[{self.name}] Failed to get response from {self.model_name} after {self.max_retries} retries.")
+
+    async def astream(self,messages,temperature=0.5,max_tokens=350,response_format=None):
+        """Yields the reply piece by piece as the model generates it"""
+        started = time.perf_counter()
+        cache_key, cached = self._cache_lookup(messages,temperature,max_tokens)
+        if cached is not None:
+            self.metrics.record_cache_hit(self.name)
+            yield cached
+            return
+        retries = 0
+        queue_wait = 0.0
+        while retries < self.max_retries:
+            parts = []
+            first_token = None
+            usage = None
+            try:
+                self._log_request(messages)
+                queued = time.perf_counter()
+                async with self._request_slot(messages,max_tokens):
+                    queue_wait += time.perf_counter() - queued
+                    backend, (first_chunk, chunks, stream) = await self.backends.astream(
+                        self.model_name,
+                        messages,
+                        **self._request_params(temperature,max_tokens,response_format)
+                    )
+
+                    async def all_chunks():
+                        if first_chunk is not None:
+                            yield first_chunk
+                        async for chunk in chunks:
+                            yield chunk
+
+                    try:
+                        async for chunk in all_chunks():
+                            # Groq reports usage on the last chunk under x_groq, OpenAI-compatible servers under usage
+                            usage = getattr(chunk, "usage", None) or getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                if first_token is None:
+                                    first_token = time.perf_counter() - started
+                                parts.append(chunk.choices[0].delta.content)
+                                yield chunk.choices[0].delta.content
+                    finally:
+                        # Releases the connection even when the consumer stops early
+                        await stream.close()
+                if self.rate_limiter is not None:
+                    self.rate_limiter.on_success()
+                self._record_call(started, queue_wait, first_token, usage, retries)
+                reply = "".join(parts)
+                if self.verbose:
+                    logger.info(f"[{self.name} received response from {backend.name}: {preview(reply)}]")
+                if cache_key is not None:
+                    self.cache.set(cache_key, reply)
+                return
+            except Exception as e:
+                # Tokens already handed to the caller cannot be taken back, so only retry a clean failure
+                if parts:
+                    self._record_call(started, queue_wait, first_token, None, retries, error=True)
+                    raise
+                retries += 1
+                await self._after_failure(e,retries)
+        self._record_call(started, queue_wait, None, None, retries, error=True)
+        raise Exception(f"[{self.name}] Failed to get response from {self.model_name} after {self.max_retries} retries.")
+
+    def _record_call(self,started,queue_wait,ttft,usage,retries,error=False):
+        self.metrics.record_call(
+            self.name,
+            latency=time.perf_counter() - started,
+            queue_wait=queue_wait,
+            ttft=ttft,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0),
+            completion_tokens=getattr(usage, "completion_tokens", 0),
+            retries=retries,
+            error=error
+        )
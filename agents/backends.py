@@ -0,0 +1,294 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from loguru import logger
+
+# Model used by every agent unless the registry maps it to another one
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+
+# Upper bound on simultaneous HTTP connections per backend
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+
+def _connection_errors():
+    """Connection and timeout errors of httpx and of the SDKs loaded so far (their timeouts subclass these)"""
+    import httpx
+    errors = [httpx.TransportError]
+    for sdk in ("groq", "openai"):
+        module = sys.modules.get(sdk)
+        if module is not None:
+            errors.append(module.APIConnectionError)
+    return tuple(errors)
+
+
+def is_retryable_error(error):
+    """
+    Connection problems, timeouts, throttling and server errors; worth trying another
+    endpoint. Anything else (a bad request, a bug in our code) fails the same everywhere.
+    """
+    if isinstance(error, _connection_errors()):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class Backend:
+    """
+    One OpenAI-compatible chat completions endpoint and the models it serves ("*" for any).
+    Tracks its own health: recent latencies, and a circuit breaker that takes it out of
+    rotation for a growing cooldown after failure_threshold consecutive failures.
+    """
+
+    def __init__(self, name, base_url=None, api_key=None, provider="groq", models=("*",),
+                 max_connections=MAX_CONNECTIONS, timeout=60.0, failure_threshold=3, cooldown_seconds=15.0):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.provider = provider
+        self.models = set(models)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        # Time to the full reply (complete) or to the first chunk (stream), which differ a lot
+        self.latencies = {"complete": deque(maxlen=200), "stream": deque(maxlen=200)}
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                # Imported here with the SDKs: they are the slowest part of starting the agents
+                import httpx
+                http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                    timeout=httpx.Timeout(self.timeout, connect=10.0)
+                )
+                # Retries are handled by AgentBase and the registry, so the shared rate limiter and health see every failure
+                if self.provider == "openai":
+                    from openai import AsyncOpenAI
+                    self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0, http_client=http_client)
+                else:
+                    from groq import AsyncGroq
+                    self._client = AsyncGroq(api_key=self.api_key, base_url=self.base_url, max_retries=0, http_client=http_client)
+            return self._client
+
+    def serves(self, model):
+        return "*" in self.models or model in self.models
+
+    @property
+    def healthy(self):
+        return time.monotonic() >= self.unhealthy_until
+
+    def latency(self, mode):
+        """Mean of the recent latencies for mode, 0.0 while unmeasured so new endpoints get tried"""
+        samples = self.latencies[mode]
+        return sum(samples) / len(samples) if samples else 0.0
+
+    def quantile(self, mode, q, min_samples=20):
+        samples = sorted(self.latencies[mode])
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def record_success(self, mode, latency):
+        self.requests += 1
+        self.latencies[mode].append(latency)
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            # Each further failure while open doubles the cooldown, up to 16x
+            extra = min(4, self.consecutive_failures - self.failure_threshold)
+            self.unhealthy_until = time.monotonic() + self.cooldown_seconds * 2 ** extra
+            logger.warning(f"[Backends] {self.name} marked unhealthy after {self.consecutive_failures} failures")
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "healthy": self.healthy,
+            "latency_seconds": round(self.latency("complete"), 3),
+            "ttft_seconds": round(self.latency("stream"), 3),
+        }
+
+
+class BackendRegistry:
+    """
+    Chooses the model for each agent and the endpoint for each request.
+
+    agent_models maps agent names (e.g. "SummarizeValidatorAgent") to a model, so
+    validators can run on a smaller, faster one. Requests go to the healthy backend
+    serving the model with the lowest recent latency and fail over to the next one on
+    connection errors, throttling or server errors. With hedge=True a second request
+    is sent once the first has been running longer than the backend's p95 latency
+    (never sooner than hedge_min_delay); whichever answers first wins.
+    """
+
+    def __init__(self, backends, agent_models=None, default_model=DEFAULT_MODEL,
+                 hedge=False, hedge_quantile=0.95, hedge_min_delay=0.5):
+        if not backends:
+            raise ValueError("BackendRegistry needs at least one backend")
+        self.backends = list(backends)
+        self.agent_models = dict(agent_models or {})
+        self.default_model = default_model
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds the registry from the environment:
+        LLM_BACKENDS   JSON list of {"name", "base_url", "api_key_env", "provider", "models"};
+                       defaults to one Groq backend (GROQ_API_KEY, GROQ_BASE_URL)
+        LLM_AGENT_MODELS  JSON object, agent name -> model
+        LLM_MODEL      default model; LLM_HEDGE=1 turns on hedged requests
+        """
+        specs = json.loads(os.getenv("LLM_BACKENDS") or "null") or [
+            {"name": "groq", "base_url": os.getenv("GROQ_BASE_URL"), "api_key_env": "GROQ_API_KEY", "provider": "groq"}
+        ]
+        backends = [
+            Backend(
+                spec.get("name", f"backend-{i}"),
+                base_url=spec.get("base_url"),
+                api_key=spec.get("api_key") or os.getenv(spec.get("api_key_env", "GROQ_API_KEY")),
+                provider=spec.get("provider", "groq"),
+                models=spec.get("models", ["*"])
+            )
+            for i, spec in enumerate(specs)
+        ]
+        return cls(
+            backends,
+            agent_models=json.loads(os.getenv("LLM_AGENT_MODELS") or "{}"),
+            default_model=os.getenv("LLM_MODEL", DEFAULT_MODEL),
+            hedge=os.getenv("LLM_HEDGE", "0") == "1"
+        )
+
+    def model_for(self, agent_name, agent_default=None):
+        return self.agent_models.get(agent_name) or agent_default or self.default_model
+
+    def candidates(self, model, mode="complete"):
+        """Backends serving model, healthy ones first, fastest first"""
+        serving = [backend for backend in self.backends if backend.serves(model)]
+        if not serving:
+            raise ValueError(f"No backend serves model '{model}'")
+        healthy = sorted((b for b in serving if b.healthy), key=lambda b: b.latency(mode))
+        # When every endpoint is open-circuited, the one that failed longest ago gets a probe
+        unhealthy = sorted((b for b in serving if not b.healthy), key=lambda b: b.unhealthy_until)
+        return healthy + unhealthy
+
+    async def _attempt(self, backend, model, request, mode):
+        started = time.perf_counter()
+        stream = None
+        try:
+            if mode == "stream":
+                stream = await backend.client.chat.completions.create(model=model, stream=True, **request)
+                iterator = stream.__aiter__()
+                first = await anext(iterator, None)
+                result = (first, iterator, stream)
+            else:
+                result = await backend.client.chat.completions.create(model=model, **request)
+        except asyncio.CancelledError:
+            # Lost a hedge race: not a failure, but the connection has to be released
+            if stream is not None:
+                await stream.close()
+            raise
+        except Exception as e:
+            if is_retryable_error(e):
+                backend.record_failure()
+            raise
+        backend.record_success(mode, time.perf_counter() - started)
+        return backend, result
+
+    async def _hedged(self, candidates, model, request, mode):
+        primary = candidates[0]
+        first = asyncio.ensure_future(self._attempt(primary, model, request, mode))
+        delay = primary.quantile(mode, self.hedge_quantile) if self.hedge else None
+        if delay is None:
+            return await first
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=max(delay, self.hedge_min_delay))
+            if not done:
+                self.hedged += 1
+                backup = candidates[1] if len(candidates) > 1 else primary
+                tasks.add(asyncio.ensure_future(self._attempt(backup, model, request, mode)))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                winners = [task for task in done if task.exception() is None]
+                if winners:
+                    winner = winners[0]
+                    if winner is not first:
+                        self.hedge_wins += 1
+                    for task in winners[1:]:
+                        await self._discard(task.result(), mode)
+                    return winner.result()
+                error = next(iter(done)).exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    async def _discard(attempt, mode):
+        if mode == "stream":
+            await attempt[1][2].close()
+
+    async def _request(self, model, request, mode):
+        candidates = self.candidates(model, mode)
+        last_error = None
+        for i in range(len(candidates)):
+            try:
+                return await self._hedged(candidates[i:], model, request, mode)
+            except Exception as e:
+                if not is_retryable_error(e):
+                    raise
+                last_error = e
+                if i + 1 < len(candidates):
+                    logger.warning(f"[Backends] {candidates[i].name} failed ({e}), failing over to {candidates[i + 1].name}")
+        raise last_error
+
+    async def acomplete(self, model, messages, **params):
+        """Returns (backend, chat completion) from the best endpoint for model"""
+        return await self._request(model, dict(messages=messages, **params), "complete")
+
+    async def astream(self, model, messages, **params):
+        """Returns (backend, (first chunk, chunk iterator, stream)) once a stream has produced its first chunk"""
+        return await self._request(model, dict(messages=messages, **params), "stream")
+
+    def stats(self):
+        return {
+            "backends": {backend.name: backend.stats() for backend in self.backends},
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Returns the process-wide registry, built from the environment on first use"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = BackendRegistry.from_env()
+        return _registry
@@ -0,0 +1,105 @@
+import re
+from .token_budget import CHARS_PER_TOKEN, estimate_tokens
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _split_units(text, max_tokens):
+    """Breaks text into paragraphs, falling back to sentences and then raw slices for oversized pieces"""
+    units = []
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            units.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            if estimate_tokens(sentence) <= max_tokens:
+                units.append(sentence)
+            else:
+                units.extend(sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars))
+    return units
+
+
+def split_text(text, chunk_tokens=1500, overlap_tokens=150):
+    """
+    Splits text into chunks of at most chunk_tokens (estimated), breaking on
+    paragraph and sentence boundaries. Consecutive chunks share up to
+    overlap_tokens of trailing context so nothing is cut mid-thought.
+    """
+    return list(iter_text_chunks([text], chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens))
+
+
+def iter_text_chunks(pieces, chunk_tokens=1500, overlap_tokens=150):
+    """
+    Streaming form of split_text: consumes text pieces (e.g. from
+    FileValidator.iter_file_content) and yields each chunk as soon as it is full.
+    """
+    if overlap_tokens >= chunk_tokens:
+        raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+    unit_budget = chunk_tokens - overlap_tokens
+
+    def units():
+        pending = []
+        pending_tokens = 0
+        for piece in pieces:
+            pending.append(piece)
+            pending_tokens += estimate_tokens(piece)
+            # Hand over complete paragraphs; fall back to whole lines for text without blank lines
+            if pending_tokens < unit_budget:
+                continue
+            buffer = "".join(pending)
+            cut = buffer.rfind("\n\n")
+            if cut <= 0:
+                cut = buffer.rfind("\n")
+            if cut <= 0:
+                continue
+            yield from _split_units(buffer[:cut], unit_budget)
+            pending = [buffer[cut:]]
+            pending_tokens = estimate_tokens(pending[0])
+        yield from _split_units("".join(pending), unit_budget)
+
+    current = []
+    current_tokens = 0
+    for unit in units():
+        unit_tokens = estimate_tokens(unit)
+        if current and current_tokens + unit_tokens > chunk_tokens:
+            yield "\n\n".join(current)
+            # Carry the tail of the previous chunk over as overlap
+            overlap = []
+            overlap_size = 0
+            for previous in reversed(current):
+                size = estimate_tokens(previous)
+                if overlap_size + size > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += size
+            current = overlap
+            current_tokens = overlap_size
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        yield "\n\n".join(current)
+
+
+def group_by_budget(texts, max_tokens):
+    """Packs consecutive texts into groups that fit max_tokens; each group holds at least two texts when possible"""
+    groups = []
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if len(current) >= 2 and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        if len(current) == 1 and groups:
+            groups[-1].append(current[0])
+        else:
+            groups.append(current)
+    return groups
@@ -0,0 +1,14 @@
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env():
+    """Loads .env into the environment once per process; later calls do nothing"""
+    global _loaded
+    with _lock:
+        if not _loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _loaded = True
@@ -0,0 +1,133 @@
+import asyncio
+import re
+from loguru import logger
+
+from .agent_base import iterate_sync
+
+_ROMAN = {"I": 1, "V": 5, "X": 10, "L": 50, "C": 100}
+
+_DATE_PATTERN = re.compile(
+    r"(?P<century>\b(?P<number>\d{1,2})(?:st|nd|rd|th)?\s+century\b|\b(?P<roman>[IVXLC]+)\s+century\b)"
+    r"(?:\s*(?P<century_era>BCE|BC|CE|AD)\b)?"
+    r"|(?:\b(?P<prefix_era>AD|CE)\s+)?\b(?P<year>\d{1,4})\b(?:\s*(?P<year_era>BCE|BC|CE|AD)\b)?",
+    re.IGNORECASE,
+)
+
+# Bare numbers later than this are counts or codes, not years
+_LATEST_BARE_YEAR = 2100
+# Words that make a bare number a reference ("page 123") or a quantity ("300 years")
+_REFERENCE_WORDS = {"page", "pages", "p", "pp", "no", "number", "chapter", "ch", "vol", "volume", "section", "line", "verse", "item"}
+_QUANTITY_WORDS = {
+    "years", "months", "weeks", "days", "hours", "people", "men", "women", "soldiers", "troops", "ships", "horses",
+    "dead", "killed", "casualties", "deaths", "copies", "pages", "words", "miles", "km", "kilometres", "kilometers",
+    "metres", "meters", "feet", "tons", "tonnes", "pounds", "dollars", "acres", "percent",
+}
+_WORD_BEFORE = re.compile(r"(\w+)\W*$")
+_WORD_AFTER = re.compile(r"^\W*?(\w+)")
+
+
+def _is_bare_year(line, match):
+    """False for a bare number that is part of a larger one (1,500 / 3.1415), a reference or a quantity"""
+    start, end = match.span("year")
+    if int(match.group("year")) > _LATEST_BARE_YEAR:
+        return False
+    before, after = line[:start], line[end:]
+    if re.search(r"\d[.,:]$", before) or re.match(r"^[.,:]\d", after) or before.endswith(("#", "$", "£", "€")):
+        return False
+    previous, following = _WORD_BEFORE.search(before), _WORD_AFTER.match(after)
+    if previous and previous.group(1).lower() in _REFERENCE_WORDS:
+        return False
+    return not (following and following.group(1).lower() in _QUANTITY_WORDS)
+
+
+def _roman_to_int(numeral):
+    total = 0
+    for current, following in zip(numeral, numeral[1:] + " "):
+        value = _ROMAN[current]
+        total += -value if following in _ROMAN and _ROMAN[following] > value else value
+    return total
+
+
+def _ordinal(number):
+    if 10 <= number % 100 <= 20:
+        suffix = "th"
+    else:
+        suffix = {1: "st", 2: "nd", 3: "rd"}.get(number % 10, "th")
+    return f"{number}{suffix}"
+
+
+def _is_bc(era):
+    return bool(era) and era.upper() in {"BC", "BCE"}
+
+
+def parse_year_centuries(content):
+    """
+    Extracts years and centuries from free text, one or more per line, normalized
+    (e.g. "XI century" -> "11th century", "1066 AD" -> "1066") and de-duplicated in order.
+    Bare numbers need three or four digits and must read like a year: not past 2100,
+    not part of a larger number, and not a reference or a quantity ("page 123",
+    "300 years"). Shorter years need an era (e.g. "79 AD").
+    """
+    found = []
+    seen = set()
+    for line in content.splitlines():
+        for match in _DATE_PATTERN.finditer(line):
+            if match.group("century"):
+                number = int(match.group("number")) if match.group("number") else _roman_to_int(match.group("roman").upper())
+                if not 1 <= number <= 21:
+                    continue
+                item = f"{_ordinal(number)} century"
+                if _is_bc(match.group("century_era")):
+                    item += " BC"
+            else:
+                year = match.group("year")
+                era = match.group("year_era") or match.group("prefix_era")
+                if not era and (len(year) < 3 or not _is_bare_year(line, match)):
+                    continue
+                item = str(int(year))
+                if _is_bc(era):
+                    item += " BC"
+            if item not in seen:
+                seen.add(item)
+                found.append(item)
+    return found
+
+
+async def aiter_events_batch(finder, validator, items, max_concurrency=8, index=None, cache=None):
+    """
+    Looks up and validates every item concurrently, yielding (index, row) as each item finishes.
+    Each item is validated as soon as its own lookup is done, while other lookups are still running.
+    Provider quotas are enforced by the agents' shared RateLimiter; max_concurrency only caps this batch.
+    With a RetrievalIndex, each lookup and validation is grounded in the passages that mention the item.
+    With a SimilarityCache, items equivalent to an earlier lookup (e.g. "1066 AD" after "1066") are answered from it.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def limited(agent, *args, **kwargs):
+        async with semaphore:
+            return await agent.aexecute(*args, **kwargs)
+
+    async def run(position, item):
+        row = {"Year/Century": item, "Events": None, "Validation": None, "Error": None}
+        cached = cache.get("events", item) if cache is not None else None
+        if cached is not None:
+            row.update(Events=cached["events"], Validation=cached["validation"])
+            return position, row
+        try:
+            context = index.context_for(item) if index is not None else None
+            row["Events"] = await limited(finder, item, context=context)
+            row["Validation"] = await limited(validator, item, row["Events"], context=context)
+            if cache is not None:
+                cache.set("events", item, {"events": row["Events"], "validation": row["Validation"]})
+        except Exception as e:
+            row["Error"] = str(e)
+            logger.error(f"[EventsBatch] '{item}' failed: {e}")
+        return position, row
+
+    for finished in asyncio.as_completed([run(position, item) for position, item in enumerate(items)]):
+        yield await finished
+
+
+def find_events_batch(finder, validator, items, **kwargs):
+    """Synchronous counterpart of aiter_events_batch, for the Streamlit script thread"""
+    return iterate_sync(aiter_events_batch(finder, validator, items, **kwargs))
@@ -1,19 +1,29 @@
 from .agent_base import AgentBase
+from .token_budget import fit_text
 
 class EventsFinderTool(AgentBase):
-    def __init__(self, max_retries, verbose=True):
-        super().__init__(name="EventsFinderTool",max_retries= max_retries,verbose = verbose)
+    max_tokens = 500
+    input_token_budget = 1200
 
-    def execute(self,year_century):
-        messages = [
+    def __init__(self, max_retries, verbose=True, **kwargs):
+        super().__init__(name="EventsFinderTool",max_retries= max_retries,verbose = verbose, **kwargs)
+
+    def build_messages(self,year_century,context=None):
+        grounding = ""
+        if context:
+            # Passages retrieved from the user's own documents
+            grounding = (
+                "Use these excerpts from the user's documents where they are relevant:\n"
+                f"{fit_text(context, self.input_room(year_century))}\n\n"
+            )
+        return [
             {"role": "system", "content" : "You are an AI assistant that searches numerous events that happened on a given year/century."},
             {
                 "role": "user",
                 "content": (
                     "Find and provide brief summary of the most important events that happened on the given year/century:\n\n"
+                    f"{grounding}"
                     f"Given year/century {year_century}:\n\n"
                 )
             }
         ]
-        historical_events = self.call_openai(messages,max_tokens= 500)
-        return historical_events
\ No newline at end of file
@@ -1,22 +1,30 @@
 from .agent_base import AgentBase
+from .token_budget import fit_text
+from .validation import JSON_INSTRUCTIONS, JsonValidation
 
-class EventsFinderValidatorAgent(AgentBase):
-    def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="EventsFinderValidatorAgent",max_retries= max_retries,verbose = verbose)
+class EventsFinderValidatorAgent(JsonValidation, AgentBase):
+    max_tokens = 512
+    input_token_budget = 2000
 
-    def execute(self,year_century,historical_events):
+    def __init__(self, max_retries=2, verbose=True, **kwargs):
+        super().__init__(name="EventsFinderValidatorAgent",max_retries= max_retries,verbose = verbose, **kwargs)
+
+    def build_messages(self,year_century,historical_events,context=None):
         system_message = "You are an expert AI assistant that validates the events that happened on a current year/century."
+        reference = f"Reference excerpts from the user's documents: \n{fit_text(context, 500)}\n\n" if context else ""
+        historical_events = fit_text(historical_events, self.input_room(year_century, reference))
         user_content = (
             "Given the original data and the historical events, verify that the brief summary of the events is indeed correct.\n"
-            "Provide a brief analysis and rate the summary of the events on a scale from 1 to 5, where 5 indicates an excellent quality.\n\n"
+            "Provide a brief analysis and rate the summary of the events on a scale from 1 to 5, where 5 indicates an excellent quality.\n"
+            "List any events that are wrong or misdated as issues.\n"
+            f"{JSON_INSTRUCTIONS}\n\n"
             f"Given year/century: \n{year_century}\n\n"
             f"Historical Events in that year/century: \n{historical_events}\n\n"
-            "Validation"
+            f"{reference}"
+            "Validation (JSON):"
         )
 
-        messages = [
+        return [
             {"role" : "system", "content": system_message},
             {"role" : "user" , "content" : user_content}
-        ]    
-        validation = self.call_openai(messages,max_tokens= 512)
-        return validation
\ No newline at end of file
+        ]
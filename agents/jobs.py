@@ -0,0 +1,172 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from loguru import logger
+
+from .agent_base import run_async
+from .pipeline import summarize_pipeline, article_pipeline, events_pipeline
+from .response_cache import skip_cache_reads
+
+# Flows that can run as jobs: kind -> pipeline builder taking the job params as keyword arguments
+PIPELINES = {
+    "summarize": summarize_pipeline,
+    "article": article_pipeline,
+    "events": events_pipeline,
+}
+
+
+class Job:
+    """Snapshot of a job: status is queued, running, done or failed"""
+
+    def __init__(self, job_id, kind, params, status, outputs, errors, created, updated, partial=None):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.status = status
+        self.outputs = outputs
+        self.errors = errors
+        self.created = created
+        self.updated = updated
+        # Text streamed so far by stages that have not finished yet
+        self.partial = partial or {}
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+
+class JobQueue:
+    """
+    Runs pipelines as background jobs on the shared agents event loop, at most
+    max_workers at a time, and records them in an SQLite table. Finished stages
+    are written as they land, so results survive browser refreshes, reruns and
+    (with a file db_path) restarts; jobs interrupted by a restart are queued again.
+    Submitting the same kind and params as a queued or running job returns that job;
+    once it has finished, the same submission starts a new run that is not answered
+    from the response cache, so it produces a new version.
+    """
+
+    def __init__(self, agent_manager, db_path=":memory:", max_workers=2, keep_seconds=7 * 24 * 3600):
+        self.agent_manager = agent_manager
+        self.max_workers = max_workers
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, params_key TEXT NOT NULL, "
+            "status TEXT NOT NULL, outputs TEXT NOT NULL, errors TEXT NOT NULL, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_params_key ON jobs (params_key)")
+        self._db.execute("DELETE FROM jobs WHERE updated < ?", (time.time() - keep_seconds,))
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._partial = {}
+        # Jobs repeating a finished one: their model calls skip cached replies
+        self._regenerate = set()
+        self._slots = None
+        interrupted = [row[0] for row in self._db.execute("SELECT id FROM jobs WHERE status IN ('queued', 'running')")]
+        for job_id in interrupted:
+            logger.info(f"[JobQueue] resuming interrupted job {job_id}")
+            self._update(job_id, status="queued", outputs={}, errors={})
+            run_async(self._run(job_id))
+
+    @staticmethod
+    def _params_key(kind, params):
+        payload = json.dumps({"kind": kind, "params": params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def submit(self, kind, **params):
+        """Queues a pipeline run and returns its job id"""
+        if kind not in PIPELINES:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        params_key = self._params_key(kind, params)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM jobs WHERE params_key = ? AND status IN ('queued', 'running') ORDER BY created DESC LIMIT 1",
+                (params_key,)
+            ).fetchone()
+            if row is not None:
+                return row[0]
+            job_id = uuid.uuid4().hex[:12]
+            if self._db.execute("SELECT 1 FROM jobs WHERE params_key = ? AND status = 'done'", (params_key,)).fetchone():
+                self._regenerate.add(job_id)
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, params, params_key, status, outputs, errors, created, updated) "
+                "VALUES (?, ?, ?, ?, 'queued', '{}', '{}', ?, ?)",
+                (job_id, kind, json.dumps(params, ensure_ascii=False), params_key, now, now)
+            )
+            self._db.commit()
+        run_async(self._run(job_id))
+        return job_id
+
+    def get(self, job_id):
+        """Returns the current Job snapshot, or None for an unknown id"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, params, status, outputs, errors, created, updated FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            partial = {stage: "".join(parts) for stage, parts in self._partial.get(job_id, {}).items()}
+        if row is None:
+            return None
+        job_id, kind, params, status, outputs, errors, created, updated = row
+        return Job(job_id, kind, json.loads(params), status, json.loads(outputs), json.loads(errors), created, updated, partial)
+
+    def recent(self, kind=None, limit=20):
+        """Most recently updated jobs, newest first"""
+        query = "SELECT id FROM jobs" + (" WHERE kind = ?" if kind else "") + " ORDER BY updated DESC LIMIT ?"
+        with self._lock:
+            ids = [row[0] for row in self._db.execute(query, ((kind, limit) if kind else (limit,)))]
+        return [self.get(job_id) for job_id in ids]
+
+    def _update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        for key in ("outputs", "errors"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key], ensure_ascii=False)
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+    async def _run(self, job_id):
+        # Created here so it belongs to the agents event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        async with self._slots:
+            job = self.get(job_id)
+            # Only affects this job's task and the stage tasks it starts
+            skip_cache_reads.set(job_id in self._regenerate)
+            self._regenerate.discard(job_id)
+            self._update(job_id, status="running")
+            outputs, errors = {}, {}
+            self._partial[job_id] = {}
+
+            def on_token(stage, chunk):
+                with self._lock:
+                    self._partial[job_id].setdefault(stage, []).append(chunk)
+
+            def on_stage_complete(stage, output, error, elapsed):
+                if output is not None:
+                    outputs[stage] = output
+                elif error is not None:
+                    errors[stage] = str(error)
+                with self._lock:
+                    self._partial[job_id].pop(stage, None)
+                self._update(job_id, outputs=outputs, errors=errors)
+
+            try:
+                result = await PIPELINES[job.kind](**job.params).arun(
+                    self.agent_manager, on_stage_complete=on_stage_complete, on_token=on_token
+                )
+                status = "done" if result.ok else "failed"
+            except Exception as e:
+                logger.error(f"[JobQueue] job {job_id} failed: {e}")
+                errors["job"] = str(e)
+                status = "failed"
+            self._update(job_id, status=status, outputs=outputs, errors=errors)
+            with self._lock:
+                self._partial.pop(job_id, None)
@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class RollingHistogram:
+    """
+    Keeps the observations from the last window_seconds and summarizes them on demand,
+    plus all-time bucket counts, sum and count for Prometheus (which only ever increase).
+    """
+
+    def __init__(self, window_seconds=300, max_samples=10000):
+        self.window_seconds = window_seconds
+        self._samples = deque(maxlen=max_samples)
+        self.total_count = 0
+        self.total_sum = 0.0
+        self.total_buckets = dict.fromkeys(LATENCY_BUCKETS, 0)
+
+    def observe(self, value, now=None):
+        self._samples.append((now or time.time(), value))
+        self.total_count += 1
+        self.total_sum += value
+        for bound in LATENCY_BUCKETS:
+            if value <= bound:
+                self.total_buckets[bound] += 1
+
+    def values(self, now=None):
+        cutoff = (now or time.time()) - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        return [value for _, value in self._samples]
+
+    def summary(self):
+        values = sorted(self.values())
+        if not values:
+            return {"count": 0, "sum": 0.0, "p50": None, "p95": None, "p99": None, "buckets": {}}
+
+        def quantile(q):
+            return values[min(len(values) - 1, int(q * len(values)))]
+
+        buckets = {str(bound): sum(1 for v in values if v <= bound) for bound in LATENCY_BUCKETS}
+        buckets["+Inf"] = len(values)
+        return {
+            "count": len(values),
+            "sum": sum(values),
+            "p50": quantile(0.50),
+            "p95": quantile(0.95),
+            "p99": quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class MetricsRegistry:
+    """
+    Per-agent metrics for every model call: counters (requests, errors, retries,
+    cache hits, prompt/completion tokens) and latency histograms (queue wait,
+    time to first token, total latency), all-time for Prometheus and over a rolling window for percentiles.
+    Exposed as Prometheus text (render_prometheus / start_http_server) or JSON (to_dict / start_periodic_dump).
+    """
+
+    COUNTERS = ("requests", "errors", "retries", "cache_hits", "prompt_tokens", "completion_tokens")
+    HISTOGRAMS = ("queue_wait_seconds", "time_to_first_token_seconds", "latency_seconds")
+
+    def __init__(self, window_seconds=300):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: dict.fromkeys(self.COUNTERS, 0))
+        self._histograms = defaultdict(lambda: {name: RollingHistogram(window_seconds) for name in self.HISTOGRAMS})
+
+    def record_cache_hit(self, agent):
+        with self._lock:
+            self._counters[agent]["cache_hits"] += 1
+
+    def record_call(self, agent, latency, queue_wait=None, ttft=None, prompt_tokens=0, completion_tokens=0, retries=0, error=False):
+        with self._lock:
+            counters = self._counters[agent]
+            counters["requests"] += 1
+            counters["retries"] += retries
+            counters["prompt_tokens"] += prompt_tokens or 0
+            counters["completion_tokens"] += completion_tokens or 0
+            if error:
+                counters["errors"] += 1
+            histograms = self._histograms[agent]
+            histograms["latency_seconds"].observe(latency)
+            if queue_wait is not None:
+                histograms["queue_wait_seconds"].observe(queue_wait)
+            if ttft is not None:
+                histograms["time_to_first_token_seconds"].observe(ttft)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                agent: {
+                    **self._counters[agent],
+                    **{name: histogram.summary() for name, histogram in self._histograms[agent].items()},
+                }
+                for agent in sorted(self._counters)
+            }
+
+    def render_prometheus(self):
+        """
+        Counters, all-time latency histograms (for rate() and histogram_quantile()), and
+        the rolling window's p50/p95/p99 as gauges, since those go down as samples expire.
+        """
+        with self._lock:
+            agents = sorted(self._counters)
+            counters = {agent: dict(self._counters[agent]) for agent in agents}
+            histograms = {
+                agent: {
+                    name: (dict(histogram.total_buckets), histogram.total_sum, histogram.total_count, histogram.summary())
+                    for name, histogram in self._histograms[agent].items()
+                }
+                for agent in agents
+            }
+        lines = []
+        for counter in self.COUNTERS:
+            lines.append(f"# TYPE agent_{counter}_total counter")
+            for agent in agents:
+                lines.append(f'agent_{counter}_total{{agent="{agent}"}} {counters[agent][counter]}')
+        for name in self.HISTOGRAMS:
+            lines.append(f"# TYPE agent_{name} histogram")
+            for agent in agents:
+                buckets, total_sum, total_count, _ = histograms[agent][name]
+                for bound, count in buckets.items():
+                    lines.append(f'agent_{name}_bucket{{agent="{agent}",le="{bound}"}} {count}')
+                lines.append(f'agent_{name}_bucket{{agent="{agent}",le="+Inf"}} {total_count}')
+                lines.append(f'agent_{name}_sum{{agent="{agent}"}} {total_sum:.6f}')
+                lines.append(f'agent_{name}_count{{agent="{agent}"}} {total_count}')
+            lines.append(f"# HELP agent_{name}_window Quantiles over the last {self.window_seconds}s")
+            lines.append(f"# TYPE agent_{name}_window gauge")
+            for agent in agents:
+                summary = histograms[agent][name][3]
+                for key, quantile in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99")):
+                    if summary[key] is not None:
+                        lines.append(f'agent_{name}_window{{agent="{agent}",quantile="{quantile}"}} {summary[key]:.6f}')
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        """Serves /metrics (Prometheus text) and /metrics.json on a daemon thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.render_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.to_dict()), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="agent-metrics-http", daemon=True).start()
+        return server
+
+    def start_periodic_dump(self, path, interval_seconds=60):
+        """Rewrites path with the JSON snapshot every interval_seconds on a daemon thread"""
+        stop = threading.Event()
+
+        def dump_loop():
+            while not stop.wait(interval_seconds):
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"timestamp": time.time(), "agents": self.to_dict()}, f)
+                # Atomic swap so readers never see a half-written file
+                os.replace(tmp_path, path)
+
+        threading.Thread(target=dump_loop, name="agent-metrics-dump", daemon=True).start()
+        return stop
+
+
+# Default registry shared by every agent in the process
+metrics = MetricsRegistry()
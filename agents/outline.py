@@ -0,0 +1,77 @@
+import os
+import re
+
+# Sections of one article written or refined at the same time (WriteArticleTool, RefinerAgent)
+ARTICLE_SECTION_CONCURRENCY = int(os.getenv("ARTICLE_SECTION_CONCURRENCY", "6"))
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+)$")
+# "1.", "1)", "IV.", "B)" or a bullet, followed by the item text
+_ITEM = re.compile(r"^(?:(\d+(?:\.\d+)*)[.)]|([IVXLC]+|[A-Za-z])[.)]|[-*+•])\s+(.+)$")
+
+_SENTENCE_END = re.compile(r"[.!?]['\")]?$")
+_CLAUSE_BREAK = re.compile(r"[,;]\s")
+
+
+def _reads_like_sentence(line):
+    """A guidance note rather than a title: long, ends like a sentence, or strings clauses together"""
+    line = line.strip()
+    return len(line) > 80 or bool(_SENTENCE_END.search(line)) or len(_CLAUSE_BREAK.findall(line)) >= 2
+
+
+class OutlineSection:
+    """One top-level entry of an outline: its title and the sub-points under it"""
+
+    def __init__(self, title, notes=None):
+        self.title = title
+        self.notes = notes or []
+
+    def __repr__(self):
+        return f"OutlineSection({self.title!r}, {len(self.notes)} notes)"
+
+
+def parse_outline(outline):
+    """
+    Splits an outline (markdown headings, numbered or bulleted lists, or titles with
+    indented notes) into its top-level sections. Markdown headings win when there are
+    any; otherwise the least indented list items are the sections, and deeper items or
+    "1.1"-style numbers become their notes. Anything else is one section: returns [].
+    """
+    lines = [line.rstrip() for line in (outline or "").splitlines() if line.strip()]
+    if not lines:
+        return []
+
+    headings = [_HEADING.match(line.strip()) for line in lines]
+    if any(headings):
+        levels = [len(match.group(1)) for match in headings if match]
+        top = min(levels)
+        if levels.count(top) == 1 and levels[0] == top and len(set(levels)) > 1:
+            # A lone "# Title" over "##" headings names the article; the "##" ones are its sections
+            top = min(level for level in levels if level > top)
+        top_level = [bool(match) and len(match.group(1)) == top for match in headings]
+        titles = [match.group(2) if match else None for match in headings]
+    else:
+        items = [_ITEM.match(line.strip()) for line in lines]
+        indents = [len(line) - len(line.lstrip()) for line in lines]
+        if any(items):
+            item_indent = min(indent for indent, item in zip(indents, items) if item)
+            top_level = [
+                bool(item) and indent == item_indent and not (item.group(1) and "." in item.group(1))
+                for item, indent in zip(items, indents)
+            ]
+            titles = [item.group(3) if item else None for item in items]
+        else:
+            # Plain lines are only split when indented notes show the structure, and not when
+            # they read like prose: "Focus on the economy\nInclude primary sources" is guidance
+            top_level = [indent == min(indents) for indent in indents]
+            if all(top_level) or any(_reads_like_sentence(line) for line, is_top in zip(lines, top_level) if is_top):
+                return []
+            titles = [line.strip() for line in lines]
+
+    sections = []
+    for line, is_top, title in zip(lines, top_level, titles):
+        if is_top:
+            sections.append(OutlineSection(title.strip(" *#:")))
+        elif sections:
+            sections[-1].notes.append(line.strip())
+        # Text before the first section (a title, a brief) only reaches the model with the whole outline
+    return sections
@@ -0,0 +1,231 @@
+import asyncio
+import os
+import queue
+import time
+from loguru import logger
+
+from .agent_base import run_async, run_sync
+from .validation import parse_validation
+
+# Validation score (1-5) at which an article is good enough to skip further refinement
+ARTICLE_QUALITY_THRESHOLD = int(os.getenv("ARTICLE_QUALITY_THRESHOLD", "4"))
+# Most refinement passes per article; each one after the first only revises what is still flagged
+ARTICLE_REFINE_ROUNDS = int(os.getenv("ARTICLE_REFINE_ROUNDS", "2"))
+
+
+class StageOutput:
+    """Placeholder for the output of another stage, resolved when that stage finishes"""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+
+class Stage:
+    """
+    One agent call in a pipeline; keyword inputs may be literals or StageOutput references.
+    Streaming stages report their reply token by token when the caller asks for it.
+    A stage with a when condition (called with the outputs so far) only runs if it returns True.
+    """
+
+    def __init__(self, name, agent, stream=False, when=None, **inputs):
+        self.name = name
+        self.agent = agent
+        self.stream = stream
+        self.when = when
+        self.inputs = inputs
+
+    @property
+    def depends_on(self):
+        return [value.stage for value in self.inputs.values() if isinstance(value, StageOutput)]
+
+
+class StageEvent:
+    """Progress report from a running pipeline: a streamed chunk, or a finished (or skipped) stage"""
+
+    def __init__(self, stage, chunk=None, output=None, error=None, elapsed=0.0, done=False):
+        self.stage = stage
+        self.chunk = chunk
+        self.output = output
+        self.error = error
+        self.elapsed = elapsed
+        self.done = done
+
+
+class PipelineResult:
+    def __init__(self):
+        self.outputs = {}
+        self.errors = {}
+        self.skipped = []
+        # Stages left out by their when condition (or downstream of one); not a failure
+        self.gated = []
+        self.timings = {}
+        self.total_time = 0.0
+
+    @property
+    def ok(self):
+        return not self.errors and not self.skipped
+
+
+class Pipeline:
+    """
+    Runs a declared graph of agent stages.
+    Each stage starts as soon as the stages it depends on have finished, so
+    independent branches run concurrently on the shared agents event loop.
+    Stages downstream of a failed stage are skipped; stages whose when condition
+    is false, and the stages that depend on them, are gated out.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        names = [stage.name for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Pipeline stage names must be unique")
+        known = set()
+        for stage in self.stages:
+            missing = [dep for dep in stage.depends_on if dep not in known]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown or later stages: {', '.join(missing)}")
+            known.add(stage.name)
+
+    async def arun(self, agent_manager, on_stage_complete=None, on_token=None):
+        result = PipelineResult()
+        tasks = {}
+        started = time.perf_counter()
+
+        async def run_stage(stage):
+            for dep in stage.depends_on:
+                await tasks[dep]
+            if any(dep in result.errors or dep in result.skipped for dep in stage.depends_on):
+                result.skipped.append(stage.name)
+                logger.warning(f"[Pipeline] skipping stage '{stage.name}' after upstream failure")
+                if on_stage_complete:
+                    on_stage_complete(stage.name, None, None, 0.0)
+                return
+            if any(dep in result.gated for dep in stage.depends_on) or (stage.when and not stage.when(result.outputs)):
+                result.gated.append(stage.name)
+                logger.info(f"[Pipeline] stage '{stage.name}' not needed, left out")
+                if on_stage_complete:
+                    on_stage_complete(stage.name, None, None, 0.0)
+                return
+
+            kwargs = {
+                key: result.outputs[value.stage] if isinstance(value, StageOutput) else value
+                for key, value in stage.inputs.items()
+            }
+            stage_start = time.perf_counter()
+            output, error = None, None
+            try:
+                agent = agent_manager.get_agent(stage.agent)
+                if stage.stream and on_token:
+                    parts = []
+                    async for chunk in agent.astream_execute(**kwargs):
+                        parts.append(chunk)
+                        on_token(stage.name, chunk)
+                    output = "".join(parts)
+                else:
+                    output = await agent.aexecute(**kwargs)
+                result.outputs[stage.name] = output
+            except Exception as e:
+                error = e
+                result.errors[stage.name] = e
+                logger.error(f"[Pipeline] stage '{stage.name}' ({stage.agent}) failed: {e}")
+            elapsed = time.perf_counter() - stage_start
+            result.timings[stage.name] = elapsed
+            logger.info(f"[Pipeline] stage '{stage.name}' finished in {elapsed:.2f}s")
+            if on_stage_complete:
+                on_stage_complete(stage.name, output, error, elapsed)
+
+        # Every task is created before any of them runs, so lookups in tasks never miss
+        for stage in self.stages:
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+        await asyncio.gather(*tasks.values())
+        result.total_time = time.perf_counter() - started
+        return result
+
+    def run(self, agent_manager):
+        return run_sync(self.arun(agent_manager))
+
+    def iter_run(self, agent_manager, stream=False):
+        """
+        Runs the pipeline in the background and yields StageEvents in the order they
+        happen, so the calling thread can render each stage as it lands.
+        With stream=True, streaming stages also yield one event per generated chunk.
+        """
+        events = queue.Queue()
+        future = run_async(self.arun(
+            agent_manager,
+            on_stage_complete=lambda stage, output, error, elapsed: events.put(
+                StageEvent(stage, output=output, error=error, elapsed=elapsed, done=True)
+            ),
+            on_token=(lambda stage, chunk: events.put(StageEvent(stage, chunk=chunk))) if stream else None
+        ))
+        remaining = len(self.stages)
+        while remaining:
+            try:
+                event = events.get(timeout=0.1)
+            except queue.Empty:
+                if future.done():
+                    # Only reachable if the run itself blew up before reporting every stage
+                    future.result()
+                    return None
+                continue
+            if event.done:
+                remaining -= 1
+            yield event
+        return future.result()
+
+
+def summarize_pipeline(text):
+    return Pipeline([
+        Stage("summary", "summarize", stream=True, text=text),
+        Stage("validation", "summarize_validator", original_text=text, summary=StageOutput("summary")),
+    ])
+
+
+def needs_refinement(validation_stage, threshold):
+    """when condition: the article checked by validation_stage scored below threshold"""
+    return lambda outputs: not parse_validation(outputs[validation_stage]).passed(threshold)
+
+
+def refinement_stages(rounds):
+    """Names of the (refined article, validation) stages of each refinement round; none when rounds <= 0"""
+    if rounds <= 0:
+        return []
+    return [("refined", "validation")] + [(f"refined_{n}", f"validation_{n}") for n in range(2, rounds + 1)]
+
+
+def final_article(outputs):
+    """The last refined version of the article in a pipeline's outputs, else the draft"""
+    rounds = sorted(int(name.partition("_")[2] or 1) for name in outputs if name == "refined" or name.startswith("refined_"))
+    if not rounds:
+        return outputs.get("draft")
+    return outputs["refined" if rounds[-1] == 1 else f"refined_{rounds[-1]}"]
+
+
+def article_pipeline(topic, outline=None, quality_threshold=ARTICLE_QUALITY_THRESHOLD, rounds=ARTICLE_REFINE_ROUNDS):
+    """
+    Draft, validate, then refine only while the latest validation scores below
+    quality_threshold: a good draft is not refined at all, and the refiner revises
+    just the sections the validator flagged when it names them.
+    """
+    stages = [
+        Stage("draft", "write_article", stream=True, topic=topic, outline=outline),
+        Stage("draft_validation", "write_article_validator", topic=topic, article=StageOutput("draft")),
+    ]
+    article, validation = "draft", "draft_validation"
+    for refined, refined_validation in refinement_stages(rounds):
+        stages += [
+            Stage(refined, "refiner", stream=True, when=needs_refinement(validation, quality_threshold),
+                  draft=StageOutput(article), validation=StageOutput(validation)),
+            Stage(refined_validation, "validator", topic=topic, article=StageOutput(refined)),
+        ]
+        article, validation = refined, refined_validation
+    return Pipeline(stages)
+
+
+def events_pipeline(year_century, context=None):
+    # context: passages retrieved from the local index, shared by the lookup and its validation
+    return Pipeline([
+        Stage("events", "historical_events", stream=True, year_century=year_century, context=context),
+        Stage("validation", "historical_events_validator", year_century=year_century, historical_events=StageOutput("events"), context=context),
+    ])
@@ -0,0 +1,171 @@
+import asyncio
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+
+
+def backoff_delay(attempt, retry_after=None, base_delay=0.5, max_delay=30.0):
+    """Exponential backoff with full jitter; a provider retry-after hint is treated as the floor"""
+    delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def is_rate_limit_error(error):
+    return getattr(error, "status_code", None) == 429
+
+
+def _parse_duration(value):
+    """Parses '12', '1.5', '2m59.5s' or '750ms' into seconds"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def retry_after_seconds(error):
+    """
+    Reads the provider's retry hint from a failed response, if there is one.
+    x-ratelimit-reset-requests is not a hint: it is the time until the whole
+    request window resets, minutes away on Groq even for a single 429.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    for name in ("retry-after", "x-ratelimit-reset-tokens"):
+        value = headers.get(name)
+        if not value:
+            continue
+        seconds = _parse_duration(value)
+        if seconds is None:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                continue
+        return max(0.0, seconds)
+    return None
+
+
+class TokenBucket:
+    """Refills rate_per_minute units per minute up to a burst of one minute's worth"""
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount=1):
+        # A single oversized request still gets through once the bucket is full
+        amount = min(amount, self.capacity)
+        # Holding the lock while sleeping keeps waiters in FIFO order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency window: grows by roughly one slot per window of successes and
+    halves on throttling, so in-flight requests settle just under the provider quota.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, decrease_cooldown=1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_cooldown = decrease_cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def increase(self):
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def decrease(self):
+        # A burst of 429s from the same window should only halve the limit once
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+class RateLimiter:
+    """
+    Process-wide client-side limiter shared by every agent: requests/min and
+    tokens/min token buckets plus an adaptive concurrency window.
+    """
+
+    def __init__(self, requests_per_minute=30, tokens_per_minute=6000, initial_concurrency=4,
+                 min_concurrency=1, max_concurrency=32):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, min_concurrency, max_concurrency)
+        self._paused_until = 0.0
+        self.throttled = 0
+        self.total_wait = 0.0
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens=1):
+        """Waits for quota and a concurrency slot, and holds the slot for the duration of the call"""
+        started = time.monotonic()
+        pause = self._paused_until - started
+        if pause > 0:
+            await asyncio.sleep(pause)
+        await self.concurrency.acquire()
+        try:
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            self.total_wait += time.monotonic() - started
+            yield
+        finally:
+            await self.concurrency.release()
+
+    def on_success(self):
+        self.concurrency.increase()
+
+    def on_rate_limited(self, retry_after=None):
+        self.throttled += 1
+        self.concurrency.decrease()
+        if retry_after:
+            # Everyone backs off, not just the request that got the 429
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def stats(self):
+        return {
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "throttled": self.throttled,
+            "total_wait_seconds": round(self.total_wait, 2),
+        }
@@ -1,17 +1,46 @@
-from .agent_base import AgentBase
+import asyncio
+from .agent_base import AgentBase, merge_in_order
+from .outline import ARTICLE_SECTION_CONCURRENCY
+from .token_budget import estimate_tokens
+from .validation import issues_by_section, parse_validation, split_sections
 
 class RefinerAgent(AgentBase):
-    def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="RefinerAgent",max_retries= max_retries,verbose = verbose)
+    temperature = 0.5
+    max_tokens = 2048
+    # Generous: the whole draft has to be rewritten, so it is only trimmed as a last resort
+    input_token_budget = 4000
+    # Drafts longer than this with several sections are refined section by section, concurrently
+    section_refine_tokens = 800
+    section_concurrency = ARTICLE_SECTION_CONCURRENCY
 
-    def execute(self,draft):
-         messages = [
+    def __init__(self, max_retries=2, verbose=True, **kwargs):
+        super().__init__(name="RefinerAgent",max_retries= max_retries,verbose = verbose, **kwargs)
+
+    def build_messages(self,draft,issues=None,section=False,headings=None):
+        """
+        issues: {"section", "problem"} dicts from a ValidationResult to fix.
+        section: draft is one section of an article whose section headings are headings.
+        """
+        issues = issues or []
+        if section and issues:
+            request = "Please revise the following section of an article to fix the problems listed below, keeping everything that is not affected unchanged. Do not write the section heading."
+        elif section:
+            request = "Please refine the following section of an article to improve its language, coherence and overall quality, without adding content that belongs to other sections. Do not write the section heading."
+        elif issues:
+            request = "Please refine the following article draft to fix the problems listed below and improve its language, coherence and ovreall quality."
+        else:
+            request = "Please refine the following article draft to improve its language, coherence and ovreall quality:"
+        problems = "".join(
+            f"- {issue['section'] + ': ' if issue['section'] else ''}{issue['problem']}\n" for issue in issues
+        )
+        context = "Sections of the article: " + "; ".join(headings) + "\n\n" if headings else ""
+        return [
             {
                 "role": "system",
                 "content":[
                 {
                     "type": "text",
-                    "text" : "You are an expert editor who refines and enchances articles for clarity, coherence and academic quality."                  
+                    "text" : "You are an expert editor who refines and enchances articles for clarity, coherence and academic quality."
                 }
               ]
             },
@@ -21,12 +50,66 @@ class RefinerAgent(AgentBase):
                     {
                         "type": "text",
                         "text": (
-                            "Please refine the following article draft to improve its language, coherence and ovreall quality:\n\n"
-                            f"{draft}\n\nRefinedArticle:"
+                            f"{request}\n\n{context}"
+                            + (f"Problems:\n{problems}\n" if problems else "")
+                            + f"{draft}\n\n" + ("RevisedSection:" if section else "RefinedArticle:")
                         )
                     }
                 ]
             }
-        ]        
-         refined_article = self.call_openai(messages= messages,temperature=0.5,max_tokens= 2048)
-         return refined_article
\ No newline at end of file
+        ]
+
+    @staticmethod
+    def _issues(validation):
+        return parse_validation(validation).issues if validation is not None else None
+
+    def plan_sections(self,draft,validation):
+        """
+        (heading, text, issues) for each section of draft, issues being the ones to fix (None to keep it as is),
+        or None when the whole draft should be refined in one call. Sections named by
+        the validation's issues are the only ones revised; a long draft with several
+        sections and no such issues has every section refined.
+        """
+        sections = split_sections(draft)
+        issues = self._issues(validation) or []
+        flagged, general = issues_by_section(sections, issues)
+        if flagged:
+            # General remarks go along with every revised section
+            return [(heading, text, flagged[i] + general if i in flagged else None) for i, (heading, text) in enumerate(sections)]
+        if sum(1 for heading, _ in sections if heading) >= 2 and estimate_tokens(draft) > self.section_refine_tokens:
+            return [(heading, text, general) for heading, text in sections]
+        return None
+
+    async def _section_stream(self,heading,text,issues,headings,slots):
+        body = text[len(heading):] if heading else text
+        if issues is None or not body.strip():
+            yield text
+            return
+        # The heading is kept as is, so later rounds can still split the article into sections
+        if heading:
+            yield f"{heading}\n\n"
+        # A section reply is about as long as the section, far below the whole-article limit
+        max_tokens = min(self.max_tokens, 2 * estimate_tokens(body) + 100)
+        messages = self.fit_messages(self.build_messages(f"{heading}\n{body.strip()}".strip(), issues, section=True, headings=headings))
+        async with slots:
+            async for chunk in self.astream(messages, temperature=self.temperature, max_tokens=max_tokens):
+                yield chunk
+        # Keep the blank lines that separated this section from the next one
+        yield text[len(text.rstrip()):]
+
+    async def astream_execute(self,draft,validation=None):
+        """Refines the whole draft, or its sections concurrently (streamed in document order)"""
+        plan = self.plan_sections(draft, validation)
+        if plan is None:
+            async for chunk in super().astream_execute(draft, self._issues(validation)):
+                yield chunk
+            return
+        headings = [heading for heading, _ in split_sections(draft) if heading]
+        slots = asyncio.Semaphore(self.section_concurrency)
+        async for chunk in merge_in_order([self._section_stream(heading, text, issues, headings, slots) for heading, text, issues in plan]):
+            yield chunk
+
+    async def aexecute(self,draft,validation=None):
+        if self.plan_sections(draft, validation) is None:
+            return await super().aexecute(draft, self._issues(validation))
+        return "".join([chunk async for chunk in self.astream_execute(draft, validation)])
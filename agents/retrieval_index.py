@@ -0,0 +1,293 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+
+import numpy as np
+
+from .chunking import split_text
+from .events_batch import _ordinal, parse_year_centuries
+from .token_budget import estimate_tokens, fit_text
+
+_WORD = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "the and for that this with from have were was are which their there they been would about into than then "
+    "them these when what also more other some such only over after before while where most many very not but "
+    "its his her had has who whom one all can may our out".split()
+)
+_YEAR = re.compile(r"^(\d+)( BC)?$")
+
+
+def date_terms(text, with_centuries=True):
+    """
+    Index terms for the years and centuries mentioned in text ("date:1066", "date:11th century").
+    With with_centuries, every year also yields the term of its century, so century queries match it.
+    """
+    terms = []
+    for item in parse_year_centuries(text):
+        terms.append("date:" + item.lower())
+        match = _YEAR.match(item)
+        if with_centuries and match and int(match.group(1)) > 0:
+            century = f"{_ordinal((int(match.group(1)) - 1) // 100 + 1)} century{match.group(2) or ''}"
+            terms.append("date:" + century.lower())
+    return terms
+
+
+def tokenize(text):
+    """Lowercased content words (two or more characters, no stopwords)"""
+    return [word for word in _WORD.findall(text.lower()) if len(word) > 1 and word not in _STOPWORDS]
+
+
+class SearchHit:
+    def __init__(self, score, source, text):
+        self.score = score
+        self.source = source
+        self.text = text
+
+    def __repr__(self):
+        return f"SearchHit({self.score:.2f}, {self.source!r})"
+
+
+class RetrievalIndex:
+    """
+    Local BM25 index over passages of ingested documents, persisted in a directory.
+
+    Every add() writes an immutable segment: postings grouped by term id in NumPy
+    arrays that are memory-mapped on load, plus the passage texts in a JSONL file.
+    Segments are merged once there are more than max_segments. Documents are
+    de-duplicated by content hash, so re-ingesting the same upload is a no-op.
+    Years and centuries mentioned in a passage are indexed as "date:" terms.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self, directory, passage_tokens=200, max_segments=8):
+        self.directory = directory
+        self.passage_tokens = passage_tokens
+        self.max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- persistence ---
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        meta_path = self._path("meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        else:
+            meta = {"segments": [], "sources": {}, "vocab": [], "next_segment": 0}
+        self._meta = meta
+        self._vocab = {term: i for i, term in enumerate(meta["vocab"])}
+        self._df = np.load(self._path("df.npy")) if meta["segments"] else np.zeros(0, dtype=np.int32)
+        self._segments = [self._open_segment(segment) for segment in meta["segments"]]
+        self._refresh_lengths()
+
+    def _open_segment(self, segment):
+        name = segment["name"]
+        arrays = {key: np.load(self._path(f"{name}.{key}.npy"), mmap_mode="r")
+                  for key in ("terms", "ptr", "docs", "tf", "len", "offsets")}
+        return dict(segment, **arrays)
+
+    def _refresh_lengths(self):
+        if self._segments:
+            self._lengths = np.concatenate([np.asarray(segment["len"], dtype=np.float32) for segment in self._segments])
+        else:
+            self._lengths = np.zeros(0, dtype=np.float32)
+
+    def _save_meta(self):
+        self._meta["segments"] = [{key: segment[key] for key in ("name", "base", "count")} for segment in self._segments]
+        np.save(self._path("df.tmp.npy"), self._df)
+        os.replace(self._path("df.tmp.npy"), self._path("df.npy"))
+        tmp_path = self._path("meta.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._meta, f, ensure_ascii=False)
+        # meta.json is swapped last, so a crash mid-write leaves the previous index intact
+        os.replace(tmp_path, self._path("meta.json"))
+
+    def _write_segment(self, base, passages, lengths, term_ids, docs, tfs):
+        """passages: list of (source, text); lengths: terms per passage; term_ids/docs/tfs: parallel postings arrays"""
+        name = f"seg_{self._meta['next_segment']:05d}"
+        self._meta["next_segment"] += 1
+        offsets = []
+        with open(self._path(f"{name}.jsonl"), "wb") as f:
+            for source, text in passages:
+                offsets.append(f.tell())
+                f.write(json.dumps({"source": source, "text": text}, ensure_ascii=False).encode("utf-8") + b"\n")
+
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        docs = np.asarray(docs, dtype=np.int32)
+        order = np.lexsort((docs, term_ids))
+        terms, starts = np.unique(term_ids[order], return_index=True)
+        arrays = {
+            "terms": terms.astype(np.int32),
+            "ptr": np.append(starts, len(order)).astype(np.int64),
+            "docs": docs[order],
+            "tf": np.asarray(tfs, dtype=np.float32)[order],
+            "len": np.asarray(lengths, dtype=np.int32),
+            "offsets": np.array(offsets, dtype=np.int64),
+        }
+        for key, array in arrays.items():
+            np.save(self._path(f"{name}.{key}.npy"), array)
+        return self._open_segment({"name": name, "base": base, "count": len(passages)})
+
+    # --- ingestion ---
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, text, source="document"):
+        """Splits text into passages and indexes them; returns the number added (0 for a known document)"""
+        text = (text or "").strip()
+        if not text:
+            return 0
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            if digest in self._meta["sources"]:
+                return 0
+            passages = [(source, passage) for passage in split_text(text, chunk_tokens=self.passage_tokens, overlap_tokens=self.passage_tokens // 10)]
+            base = len(self._lengths)
+            lengths, term_ids, docs, tfs = [], [], [], []
+            df_updates = {}
+            for local, (_, passage) in enumerate(passages):
+                counts = {}
+                for term in tokenize(passage) + date_terms(passage):
+                    counts[term] = counts.get(term, 0) + 1
+                lengths.append(sum(counts.values()))
+                for term, count in counts.items():
+                    term_id = self._vocab.get(term)
+                    if term_id is None:
+                        term_id = self._vocab[term] = len(self._meta["vocab"])
+                        self._meta["vocab"].append(term)
+                    term_ids.append(term_id)
+                    docs.append(base + local)
+                    tfs.append(count)
+                    df_updates[term_id] = df_updates.get(term_id, 0) + 1
+
+            df = np.zeros(len(self._meta["vocab"]), dtype=np.int32)
+            df[:len(self._df)] = self._df
+            for term_id, count in df_updates.items():
+                df[term_id] += count
+            self._df = df
+            self._segments.append(self._write_segment(base, passages, lengths, term_ids, docs, tfs))
+            self._meta["sources"][digest] = {"source": source, "passages": len(passages)}
+            stale = self._merge_segments() if len(self._segments) > self.max_segments else []
+            self._refresh_lengths()
+            self._save_meta()
+            # Old segment files go only once meta.json no longer points at them
+            for segment in stale:
+                for key in ("terms", "ptr", "docs", "tf", "len", "offsets"):
+                    os.remove(self._path(f"{segment['name']}.{key}.npy"))
+                os.remove(self._path(f"{segment['name']}.jsonl"))
+            return len(passages)
+
+    def _merge_segments(self):
+        """Rewrites every segment as one, keeping the global doc ids; returns the replaced segments"""
+        old = self._segments
+        passages = []
+        for segment in old:
+            for local in range(segment["count"]):
+                record = self._read_passage(segment, local)
+                passages.append((record["source"], record["text"]))
+        merged = self._write_segment(
+            0,
+            passages,
+            np.concatenate([segment["len"] for segment in old]),
+            np.concatenate([np.repeat(segment["terms"], np.diff(segment["ptr"])) for segment in old]),
+            np.concatenate([segment["docs"] for segment in old]),
+            np.concatenate([segment["tf"] for segment in old]),
+        )
+        self._segments = [merged]
+        return old
+
+    # --- retrieval ---
+
+    def _read_passage(self, segment, local):
+        with open(self._path(f"{segment['name']}.jsonl"), "rb") as f:
+            f.seek(int(segment["offsets"][local]))
+            return json.loads(f.readline())
+
+    def _passage(self, doc):
+        for segment in self._segments:
+            if segment["base"] <= doc < segment["base"] + segment["count"]:
+                return self._read_passage(segment, doc - segment["base"])
+        raise IndexError(doc)
+
+    def _postings(self, term_id):
+        for segment in self._segments:
+            i = np.searchsorted(segment["terms"], term_id)
+            if i < len(segment["terms"]) and segment["terms"][i] == term_id:
+                start, stop = segment["ptr"][i], segment["ptr"][i + 1]
+                yield segment["docs"][start:stop], segment["tf"][start:stop]
+
+    def search(self, query, k=5, require_dates=False):
+        """
+        Top-k passages for query by BM25 over its keywords and dates.
+        With require_dates, only passages mentioning one of the query's years/centuries qualify.
+        """
+        with self._lock:
+            count = len(self._lengths)
+            if not count:
+                return []
+            dates = [term for term in date_terms(query, with_centuries=False) if term in self._vocab]
+            if require_dates and not dates:
+                return []
+            terms = {self._vocab[term] for term in tokenize(query) + dates if term in self._vocab}
+            if not terms:
+                return []
+            average = float(self._lengths.mean())
+            norm = self.K1 * (1 - self.B + self.B * self._lengths / average)
+            scores = np.zeros(count, dtype=np.float32)
+            for term_id in terms:
+                df = int(self._df[term_id])
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                for docs, tf in self._postings(term_id):
+                    # A term appears once per doc in a segment, so plain fancy indexing accumulates correctly
+                    scores[docs] += idf * tf * (self.K1 + 1) / (tf + norm[docs])
+            if require_dates:
+                mask = np.zeros(count, dtype=bool)
+                for term in dates:
+                    for docs, _ in self._postings(self._vocab[term]):
+                        mask[docs] = True
+                scores[~mask] = 0.0
+            candidates = np.flatnonzero(scores > 0)
+            if not len(candidates):
+                return []
+            top = candidates[np.argsort(-scores[candidates], kind="stable")[:k]]
+            hits = []
+            for doc in top:
+                record = self._passage(int(doc))
+                hits.append(SearchHit(float(scores[doc]), record["source"], record["text"]))
+            return hits
+
+    def context_for(self, query, max_tokens=600, k=5):
+        """Best matching passages packed into max_tokens, for grounding a prompt; "" when nothing matches"""
+        parts = []
+        used = 0
+        for hit in self.search(query, k=k):
+            if max_tokens - used < 30:
+                break
+            passage = fit_text(f"[{hit.source}] {hit.text}", max_tokens - used)
+            used += estimate_tokens(passage)
+            parts.append(passage)
+        return "\n\n".join(parts)
+
+    def answer(self, year_century, k=5):
+        """Answers a year/century lookup from passages that mention it, without a model call; None if none do"""
+        hits = self.search(year_century, k=k, require_dates=True)
+        if not hits:
+            return None
+        lines = [f"Passages from your documents that mention {year_century.strip()}:"]
+        lines.extend(f"- **{hit.source}**: {hit.text}" for hit in hits)
+        return "\n\n".join(lines)
+
+    def stats(self):
+        return {"documents": len(self._meta["sources"]), "passages": len(self._lengths),
+                "terms": len(self._meta["vocab"]), "segments": len(self._segments)}
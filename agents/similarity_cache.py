@@ -0,0 +1,140 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .events_batch import _DATE_PATTERN, parse_year_centuries
+
+_WORD = re.compile(r"\w+")
+_BITS = np.arange(64, dtype=np.uint64)
+# Words that do not change what a date lookup asks for
+_FILLER_WORDS = {
+    "year", "years", "century", "centuries", "ad", "ce", "bc", "bce", "event", "events", "happened",
+    "what", "in", "of", "and", "the", "a", "an", "on", "during", "around", "circa", "history", "historical",
+}
+
+
+def canonical_query(text):
+    """
+    Canonical form of a short lookup query: its sorted years/centuries plus its other
+    content words, without filler ("year 1066", "1066 AD" and "1066." all become
+    "1066", while "1066 in Japan" keeps "japan").
+    """
+    dates = parse_year_centuries(text)
+    words = sorted(set(_WORD.findall(_DATE_PATTERN.sub(" ", text).lower())) - _FILLER_WORDS)
+    if dates:
+        return "dates:" + "|".join(sorted(dates)) + " words:" + " ".join(words)
+    return "words:" + " ".join(_WORD.findall(text.lower()))
+
+
+def simhash(text, shingle=3):
+    """
+    64-bit SimHash over word shingles; near-identical texts differ in few bits.
+    Uses Python's string hash, so fingerprints are only comparable within one process.
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return 0
+    hashes = np.fromiter(map(hash, words), dtype=np.int64, count=len(words)).view(np.uint64)
+    if len(hashes) >= shingle:
+        # Combine neighbouring word hashes into shingle hashes (uint64 arithmetic wraps)
+        shingles = hashes[:len(hashes) - shingle + 1].copy()
+        for offset in range(1, shingle):
+            shingles = shingles * np.uint64(1099511628211) ^ hashes[offset:len(hashes) - shingle + 1 + offset]
+    else:
+        shingles = hashes
+    # Bit k of the fingerprint is the majority vote of bit k over all shingles
+    ones = np.zeros(64, dtype=np.int64)
+    for start in range(0, len(shingles), 65536):
+        block = shingles[start:start + 65536]
+        ones += ((block[:, None] >> _BITS) & np.uint64(1)).sum(axis=0, dtype=np.int64)
+    bits = ones * 2 > len(shingles)
+    return int((bits.astype(np.uint64) << _BITS).sum(dtype=np.uint64))
+
+
+def simhash_similarity(a, b):
+    """Share of equal bits between two fingerprints (1.0 means identical)"""
+    return 1.0 - (a ^ b).bit_count() / 64
+
+
+class SimilarityCache:
+    """
+    Result cache keyed by what a request means rather than its exact bytes.
+
+    Short lookups (e.g. events for a year/century) match on their canonical form,
+    so "1066", "year 1066" and "1066 AD" share one entry. Documents match when
+    their SimHash similarity is at least threshold and their lengths are within
+    length_tolerance of each other. Entries are kept per kind (e.g. "summarize",
+    "events") in a bounded LRU with an optional TTL.
+    """
+
+    def __init__(self, max_entries=256, threshold=0.9, length_tolerance=0.2, ttl_seconds=None):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.length_tolerance = length_tolerance
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _signature(self, text, as_document):
+        if as_document:
+            return ("simhash", simhash(text), len(text))
+        return ("exact", canonical_query(text), len(text))
+
+    def _matches(self, signature, other):
+        if signature[0] != other[0]:
+            return False
+        if signature[0] == "exact":
+            return signature[1] == other[1]
+        longest = max(signature[2], other[2], 1)
+        if abs(signature[2] - other[2]) / longest > self.length_tolerance:
+            return False
+        return simhash_similarity(signature[1], other[1]) >= self.threshold
+
+    def get(self, kind, text, as_document=False):
+        """Returns the value stored for a request equivalent to text, or None"""
+        signature = self._signature(text, as_document)
+        now = time.time()
+        with self._lock:
+            for key, (entry_kind, entry_signature, value, created) in reversed(list(self._entries.items())):
+                if entry_kind != kind or not self._matches(signature, entry_signature):
+                    continue
+                if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def set(self, kind, text, value, as_document=False):
+        """Stores value for text, replacing any entry it would match"""
+        signature = self._signature(text, as_document)
+        with self._lock:
+            for key, (entry_kind, entry_signature, _, _) in list(self._entries.items()):
+                if entry_kind == kind and self._matches(signature, entry_signature):
+                    del self._entries[key]
+            self._entries[self._next_id] = (kind, signature, value, time.time())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,11 +1,20 @@
-from .agent_base import AgentBase
+import asyncio
+from .agent_base import AgentBase, run_sync
+from .chunking import iter_text_chunks, group_by_budget
 
 class SummarizeTool(AgentBase):
-    def __init__(self, max_retries=3, verbose=True):
-        super().__init__(name="SummarizeTool",max_retries= max_retries,verbose = verbose)
+    max_tokens = 300
+    input_token_budget = 6000
+    # Chunked (map-reduce) mode settings
+    chunk_tokens = 1500
+    overlap_tokens = 150
+    max_concurrency = 4
 
-    def execute(self,text):
-        messages = [
+    def __init__(self, max_retries=3, verbose=True, **kwargs):
+        super().__init__(name="SummarizeTool",max_retries= max_retries,verbose = verbose, **kwargs)
+
+    def build_messages(self,text):
+        return [
             {"role": "system", "content" : "You are an AI assistant that summarizes historical texts."},
             {
                 "role": "user",
@@ -15,5 +24,79 @@ class SummarizeTool(AgentBase):
                 )
             }
         ]
-        summary = self.call_openai(messages,max_tokens=300)
-        return summary
\ No newline at end of file
+
+    def build_reduce_messages(self,summaries):
+        joined = "\n\n".join(f"Part {i}:\n{summary}" for i, summary in enumerate(summaries, start=1))
+        return [
+            {"role": "system", "content" : "You are an AI assistant that summarizes historical texts."},
+            {
+                "role": "user",
+                "content": (
+                    "The following are summaries of consecutive parts of one historical text. "
+                    "Combine them into a single short summary of the whole text:\n\n"
+                    f"{joined}\n\nSummary:"
+                )
+            }
+        ]
+
+    async def asummarize_chunked(self,text,chunk_tokens=None,overlap_tokens=None,max_concurrency=None):
+        """
+        Map-reduce summary for texts that do not fit one prompt.
+        Returns (summary, chunk_summaries).
+        """
+        return await self.asummarize_pieces([text],chunk_tokens=chunk_tokens,overlap_tokens=overlap_tokens,max_concurrency=max_concurrency)
+
+    async def asummarize_pieces(self,pieces,chunk_tokens=None,overlap_tokens=None,max_concurrency=None):
+        """
+        asummarize_chunked over text pieces as they are extracted (e.g. FileValidator.iter_file_content).
+        Each chunk is summarized as soon as the chunker emits it, while the rest is still being
+        parsed, and only max_concurrency chunks are held at a time; the text itself is never joined.
+        Returns (summary, chunk_summaries).
+        """
+        chunk_tokens = chunk_tokens or self.chunk_tokens
+        overlap_tokens = self.overlap_tokens if overlap_tokens is None else overlap_tokens
+        chunks = iter_text_chunks(pieces, chunk_tokens=chunk_tokens, overlap_tokens=overlap_tokens)
+        return await self.asummarize_chunks(chunks,chunk_tokens=chunk_tokens,max_concurrency=max_concurrency)
+
+    async def asummarize_chunks(self,chunks,chunk_tokens=None,max_concurrency=None):
+        """Map-reduce summary of an iterator of chunks, pulled one at a time; returns (summary, chunk_summaries)"""
+        chunk_tokens = chunk_tokens or self.chunk_tokens
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def summarize(messages):
+            async with semaphore:
+                return await self.acall(messages,temperature=self.temperature,max_tokens=self.max_tokens)
+
+        async def summarize_chunk(chunk):
+            try:
+                return await self.acall(self.build_messages(chunk),temperature=self.temperature,max_tokens=self.max_tokens)
+            finally:
+                semaphore.release()
+
+        chunks = iter(chunks)
+        tasks = []
+        try:
+            while True:
+                # Waiting for a free slot before pulling the next chunk bounds the text in memory
+                await semaphore.acquire()
+                # Parsing and chunking are blocking, so they run off the event loop
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    semaphore.release()
+                    break
+                tasks.append(asyncio.ensure_future(summarize_chunk(chunk)))
+            chunk_summaries = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if not chunk_summaries:
+            raise ValueError("nothing to summarize: no text chunks")
+        summaries = list(chunk_summaries)
+        while len(summaries) > 1:
+            groups = group_by_budget(summaries, chunk_tokens)
+            summaries = await asyncio.gather(*(summarize(self.build_reduce_messages(group)) for group in groups))
+        return summaries[0], list(chunk_summaries)
+
+    def summarize_chunked(self,text,**kwargs):
+        return run_sync(self.asummarize_chunked(text,**kwargs))
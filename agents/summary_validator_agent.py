@@ -1,21 +1,34 @@
 from .agent_base import AgentBase
+from .token_budget import fit_chunk_summaries, fit_text
+from .validation import JSON_INSTRUCTIONS, JsonValidation
 
-class SummarizeValidatorAgent(AgentBase):
-    def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="SummarizeValidatorAgent",max_retries= max_retries,verbose = verbose)
+class SummarizeValidatorAgent(JsonValidation, AgentBase):
+    max_tokens = 512
+    input_token_budget = 2500
 
-    def execute(self,original_text,summary):
+    def __init__(self, max_retries=2, verbose=True, **kwargs):
+        super().__init__(name="SummarizeValidatorAgent",max_retries= max_retries,verbose = verbose, **kwargs)
+
+    def build_messages(self,original_text,summary,chunk_summaries=None):
         system_message = "You are an expert AI assistant that validates the summaries of historical texts."
+        room = self.input_room(summary)
+        if chunk_summaries:
+            # Large texts are checked against their section summaries instead of the raw text
+            sections = fit_chunk_summaries(chunk_summaries, room)
+            source = f"Summaries of the original text, section by section:\n{sections}\n\n"
+        else:
+            # The key sentences are what a summary is judged against
+            source = f"Original Text: {fit_text(original_text, room, strategy='salient')}\n\n"
         user_content = (
             "Given the original summary, evaluate whether the summary accurately capture the key points and if it is of high quality.\n"
-            "Provide a brief analysis and rate the summary on a scale from 1 to 5, where 5 indicates an excellent quality.\n\n"
-            f"Original Text: {original_text}\n\n"
+            "Provide a brief analysis and rate the summary on a scale from 1 to 5, where 5 indicates an excellent quality.\n"
+            "List any key points that are missing or wrong as issues.\n"
+            f"{JSON_INSTRUCTIONS}\n\n"
+            f"{source}"
             f"Summary: \n{summary}\n\n"
-            "Validation"
+            "Validation (JSON):"
         )
-        messages = [
+        return [
             {"role" : "system", "content": system_message},
             {"role" : "user" , "content" : user_content}
-        ]    
-        validation = self.call_openai(messages,max_tokens= 512)
-        return validation
\ No newline at end of file
+        ]
@@ -0,0 +1,141 @@
+import re
+
+# Rough average for English prose with the llama tokenizer; used to turn token budgets into character cuts
+CHARS_PER_TOKEN = 4
+
+# Approximates a BPE tokenizer: digits in groups of three, words in pieces of up to 8 letters, each punctuation mark
+_TOKEN = re.compile(r"\d{1,3}|[^\W\d_]{1,8}|[^\w\s]|_")
+# Texts longer than this are estimated from evenly spaced samples
+_SAMPLE_WINDOW = 2000
+_SAMPLES = 8
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"[^\W\d_]{4,}|\d{3,4}")
+_STOPWORDS = frozenset(
+    "that this with from have were which their there they been would about into than then them these "
+    "when what also more other some such only over after before while where most many very".split()
+)
+# Per message allowance for role and formatting tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    """Fast local token estimate: exact pattern count for short texts, sampled for long ones"""
+    if not text:
+        return 0
+    if len(text) <= _SAMPLE_WINDOW * _SAMPLES:
+        return len(_TOKEN.findall(text))
+    step = len(text) // _SAMPLES
+    sampled = sum(len(_TOKEN.findall(text, i * step, i * step + _SAMPLE_WINDOW)) for i in range(_SAMPLES))
+    return int(sampled * len(text) / (_SAMPLE_WINDOW * _SAMPLES)) + 1
+
+
+def content_text(content):
+    """Text of a message content, either a string or a list of typed parts"""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content or ""
+
+
+def message_tokens(messages):
+    """Estimated prompt size of a chat message list"""
+    return sum(estimate_tokens(content_text(msg["content"])) + MESSAGE_OVERHEAD_TOKENS for msg in messages)
+
+
+def _cut(text, max_tokens, from_end=False):
+    """Longest prefix (or suffix) of text within max_tokens, cut at a sentence or word boundary when possible"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens) * CHARS_PER_TOKEN
+    piece = text[-max_chars:] if from_end else text[:max_chars]
+    # The char estimate can overshoot for dense text; shrink until it fits
+    while piece and estimate_tokens(piece) > max_tokens:
+        piece = piece[len(piece) // 10 + 1:] if from_end else piece[:-(len(piece) // 10 + 1)]
+    if from_end:
+        boundary = _SENTENCE_END.search(piece)
+        if boundary and boundary.end() < len(piece) // 5:
+            return piece[boundary.end():]
+        space = piece.find(" ")
+        return piece[space + 1:] if 0 <= space < len(piece) // 5 else piece
+    boundary = max(piece.rfind(". "), piece.rfind("\n"))
+    if boundary > len(piece) * 4 // 5:
+        return piece[:boundary + 1]
+    space = piece.rfind(" ")
+    return piece[:space] if space > len(piece) * 4 // 5 else piece
+
+
+def lead_tail(text, max_tokens, lead_share=0.7):
+    """Keeps the beginning and end of text within max_tokens and marks the omitted middle"""
+    total = estimate_tokens(text)
+    if total <= max_tokens:
+        return text
+    marker_tokens = 12
+    lead_tokens = int((max_tokens - marker_tokens) * lead_share)
+    tail_tokens = max_tokens - marker_tokens - lead_tokens
+    lead = _cut(text, lead_tokens)
+    tail = _cut(text[len(lead):], tail_tokens, from_end=True) if tail_tokens > 0 else ""
+    omitted = max(0, total - estimate_tokens(lead) - estimate_tokens(tail))
+    return f"{lead}\n\n[... about {omitted} tokens omitted ...]\n\n{tail}".rstrip()
+
+
+def salient_sentences(text, max_tokens):
+    """
+    Extractive compression: scores sentences by how frequent their content words
+    are across the text (years and numbers count double) and keeps the best ones
+    that fit max_tokens, in their original order. The first sentence is always kept.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    sentences = [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+    frequency = {}
+    for word in _WORD.findall(text.lower()):
+        if word not in _STOPWORDS:
+            frequency[word] = frequency.get(word, 0) + (2 if word.isdigit() else 1)
+
+    def score(sentence):
+        words = [w for w in _WORD.findall(sentence.lower()) if w not in _STOPWORDS]
+        if not words:
+            return 0.0
+        # Square root length normalization favours informative sentences without always picking the longest
+        return sum(frequency[w] for w in words) / len(words) ** 0.5
+
+    ranked = sorted(range(1, len(sentences)), key=lambda i: (-score(sentences[i]), i))
+    first = _cut(sentences[0], max_tokens - 6)
+    chosen = {0}
+    used = estimate_tokens(first) + 6
+    for i in ranked:
+        # Room for the joining space and a possible "[...]" gap marker
+        tokens = estimate_tokens(sentences[i]) + 6
+        if used + tokens <= max_tokens:
+            chosen.add(i)
+            used += tokens
+    parts = [first if i == 0 else sentences[i] for i in sorted(chosen)]
+    # Mark the gaps so the model knows the text is an excerpt
+    out = []
+    previous = -1
+    for i, part in zip(sorted(chosen), parts):
+        if i != previous + 1:
+            out.append("[...]")
+        out.append(part)
+        previous = i
+    if previous != len(sentences) - 1:
+        out.append("[...]")
+    return " ".join(out)
+
+
+def fit_chunk_summaries(chunk_summaries, max_tokens):
+    """Joins per-section summaries, trimming each one evenly when together they exceed max_tokens"""
+    sections = [f"Section {i}: {part}" for i, part in enumerate(chunk_summaries, start=1)]
+    if sum(estimate_tokens(s) for s in sections) <= max_tokens or not sections:
+        return "\n\n".join(sections)
+    share = max(1, max_tokens // len(sections))
+    return "\n\n".join(_cut(s, share) for s in sections)
+
+
+STRATEGIES = {"lead_tail": lead_tail, "salient": salient_sentences}
+
+
+def fit_text(text, max_tokens, strategy="lead_tail"):
+    """Returns text unchanged when it fits max_tokens, otherwise compressed with the named strategy"""
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text
+    return STRATEGIES[strategy](text, max(1, max_tokens))
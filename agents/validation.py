@@ -0,0 +1,144 @@
+import json
+import re
+
+# Appended to every validator prompt; the reply is requested in JSON mode
+JSON_INSTRUCTIONS = (
+    "Respond with a JSON object only, in this format:\n"
+    '{"score": <integer 1-5>, "summary": "<brief analysis>", '
+    '"issues": [{"section": "<heading or part concerned, empty if general>", "problem": "<what to fix>"}]}'
+)
+
+_JSON_BLOCK = re.compile(r"\{.*\}", re.DOTALL)
+_SCORE_PATTERNS = (
+    re.compile(r"\b([1-5])(?:\.\d+)?\s*(?:/|out of)\s*5\b", re.IGNORECASE),
+    re.compile(r"(?:score|rating|rate|rated)\D{0,20}([1-5])\b", re.IGNORECASE),
+)
+
+
+class ValidationResult(str):
+    """
+    Parsed validator reply. It is a str holding the readable report, so existing
+    displays, caches and JSON outputs keep working, and it also carries the
+    typed fields: score (1-5, None if the reply had none), summary and issues
+    (list of {"section", "problem"} dicts).
+    """
+
+    def __new__(cls, score, summary, issues=()):
+        issues = [dict(section=str(i.get("section") or ""), problem=str(i.get("problem") or "")) for i in issues]
+        lines = [f"**Score: {score}/5**" if score is not None else "**Score: n/a**", "", summary.strip()]
+        if issues:
+            lines += ["", "Issues:"]
+            lines += [f"- {issue['section'] + ': ' if issue['section'] else ''}{issue['problem']}" for issue in issues]
+        self = super().__new__(cls, "\n".join(lines))
+        self.score = score
+        self.summary = summary.strip()
+        self.issues = issues
+        return self
+
+    def __reduce__(self):
+        # Rebuilt from the typed fields: str's own pickling would call __new__ with the text alone
+        return (ValidationResult, (self.score, self.summary, self.issues))
+
+    def passed(self, threshold):
+        """True when the score reaches threshold; an unscored reply never passes"""
+        return self.score is not None and self.score >= threshold
+
+    def to_dict(self):
+        return {"score": self.score, "summary": self.summary, "issues": self.issues}
+
+
+_FRACTION = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(?:/|out of)\s*(\d+(?:\.\d+)?)\s*$", re.IGNORECASE)
+
+
+def _clamp_score(value):
+    """A 1-5 score from a number or a string like "4", "4/5" or "8 out of 10", else None"""
+    if isinstance(value, bool):
+        return None
+    fraction = _FRACTION.match(value) if isinstance(value, str) else None
+    if fraction:
+        numerator, denominator = float(fraction.group(1)), float(fraction.group(2))
+        value = numerator * 5 / denominator if denominator else None
+    try:
+        return min(5, max(1, int(round(float(value)))))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_validation(reply):
+    """
+    Reads a validator reply: JSON (also when wrapped in prose or code fences),
+    falling back to a "4/5" or "rating: 4" pattern in free text.
+    """
+    if isinstance(reply, ValidationResult):
+        return reply
+    reply = reply or ""
+    match = _JSON_BLOCK.search(reply)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            issues = data.get("issues") or []
+            if not isinstance(issues, list):
+                issues = [issues]
+            issues = [issue if isinstance(issue, dict) else {"problem": issue} for issue in issues]
+            summary = data.get("summary") or data.get("analysis") or ""
+            return ValidationResult(_clamp_score(data.get("score", data.get("rating"))), str(summary), issues)
+    for pattern in _SCORE_PATTERNS:
+        found = pattern.search(reply)
+        if found:
+            return ValidationResult(int(found.group(1)), reply)
+    return ValidationResult(None, reply)
+
+
+class JsonValidation:
+    """Mixin for validator agents: replies are requested in JSON mode and parsed into a ValidationResult"""
+
+    response_format = {"type": "json_object"}
+
+    def parse_reply(self, reply):
+        return parse_validation(reply)
+
+
+# Markdown headings, or a line that is only bold text
+_HEADING = re.compile(r"^(?:#{1,6}\s+.+|\*\*[^*\n]+\*\*:?)[ \t]*$", re.MULTILINE)
+
+
+def _heading_key(heading):
+    return " ".join(re.findall(r"[^\W\d_]+", heading.lower()))
+
+
+def split_sections(text):
+    """
+    Splits a markdown article at its headings into (heading, text) pairs that join
+    back into the original; text before the first heading has the heading "".
+    """
+    starts = [match.start() for match in _HEADING.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(text)]
+    sections = []
+    for start, end in zip(bounds, bounds[1:]):
+        chunk = text[start:end]
+        match = _HEADING.match(chunk)
+        sections.append((match.group(0).strip() if match else "", chunk))
+    return sections
+
+
+def issues_by_section(sections, issues):
+    """
+    Maps each issue to the sections it names ({section index: [issues]}), matching
+    headings loosely. Issues that name no section found in the article are returned
+    separately as general ones.
+    """
+    keys = [_heading_key(heading) for heading, _ in sections]
+    flagged, general = {}, []
+    for issue in issues:
+        wanted = _heading_key(issue.get("section", ""))
+        matches = [i for i, key in enumerate(keys) if wanted and key and (wanted in key or key in wanted)]
+        for i in matches:
+            flagged.setdefault(i, []).append(issue)
+        if not matches:
+            general.append(issue)
+    return flagged, general
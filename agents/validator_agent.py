@@ -1,11 +1,18 @@
 from .agent_base import AgentBase
+from .token_budget import fit_text
+from .validation import JSON_INSTRUCTIONS, JsonValidation
 
-class ValidatorAgent(AgentBase):
-    def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="ValidatorAgent", max_retries=max_retries, verbose=verbose)
+class ValidatorAgent(JsonValidation, AgentBase):
+    temperature = 0.3 # lower temperature => more deterministic output
+    max_tokens = 500
+    input_token_budget = 3000
 
-    def execute(self, topic, article):
-        messages = [
+    def __init__(self, max_retries=2, verbose=True, **kwargs):
+        super().__init__(name="ValidatorAgent", max_retries=max_retries, verbose=verbose, **kwargs)
+
+    def build_messages(self, topic, article):
+        article = fit_text(article, self.input_room(topic))
+        return [
             {
                 "role": "system",
                 "content": "You are an AI assistant that validates historical articles for accuracy, completeness, and adherence to academic standards."
@@ -14,15 +21,11 @@ class ValidatorAgent(AgentBase):
                 "role": "user",
                 "content":
                             "Given the topic and the historical article below, evaluate whether the article comprehensively covers the topic, follows a logical structure, and maintains academic standards.\n"
-                            "Provide a brief analysis and rate the article on a scale from 1 to 5, where 5 indicates excellent quality.\n\n"
+                            "Provide a brief analysis and rate the article on a scale from 1 to 5, where 5 indicates excellent quality.\n"
+                            "List the problems that need fixing, naming the section each one is in.\n"
+                            f"{JSON_INSTRUCTIONS}\n\n"
                             f"Topic: {topic}\n\n"
                             f"Article:\n{article}\n\n"
-                            "Validation:" 
+                            "Validation (JSON):"
             }
         ]
-        validation = self.call_openai(
-            messages=messages,
-            temperature=0.3, # lower temperature => more deterministic output
-            max_tokens=500,
-        )
-        return validation
\ No newline at end of file
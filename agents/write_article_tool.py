@@ -1,20 +1,79 @@
-from .agent_base import AgentBase
+import asyncio
+from .agent_base import AgentBase, merge_in_order
+from .outline import ARTICLE_SECTION_CONCURRENCY, parse_outline
+from .token_budget import fit_text
 
 class WriteArticleTool(AgentBase):
-    def __init__(self, max_retries, verbose=True):
-        super().__init__(name="WriteArticleTool",max_retries= max_retries,verbose = verbose)
+    max_tokens = 1000
+    input_token_budget = 1500
+    # Outlines with at least this many sections are written section by section, concurrently
+    min_sections = 2
+    section_max_tokens = 700
+    section_concurrency = ARTICLE_SECTION_CONCURRENCY
 
-    def execute(self,topic,outline= None):
+    def __init__(self, max_retries, verbose=True, **kwargs):
+        super().__init__(name="WriteArticleTool",max_retries= max_retries,verbose = verbose, **kwargs)
+
+    def build_messages(self,topic,outline= None):
         system_message = "You are an expert academic history writer."
         user_content = f"Write a historical article on the following topic:\nTopic: {topic}\n\n"
-        
+
         if outline:
-            user_content += f"Outline:\n{outline}\n\n"
+            user_content += f"Outline:\n{fit_text(outline, self.input_room(topic))}\n\n"
         user_content += f"Article:\n"
 
-        messages = [
+        return [
+            {"role" : "system", "content": system_message},
+            {"role" : "user" , "content" : user_content}
+        ]
+
+    def build_section_messages(self,topic,outline,sections,index):
+        """Prompt for one section; every section sees the whole outline, so they fit together"""
+        system_message = "You are an expert academic history writer."
+        section = sections[index]
+        notes = "".join(f"{note}\n" for note in section.notes)
+        position = "the first section" if index == 0 else "the last section" if index == len(sections) - 1 else f"section {index + 1} of {len(sections)}"
+        user_content = (
+            f"You are writing one section of a historical article on the following topic:\nTopic: {topic}\n\n"
+            f"Outline of the whole article:\n{fit_text(outline, self.input_room(topic, notes, reserve=300))}\n\n"
+            f"Write only the section \"{section.title}\", which is {position} in the article.\n"
+            + (f"It should cover:\n{notes}" if notes else "")
+            + "Other sections are written separately: do not repeat their content, and do not write the heading.\n\n"
+            "Section:\n"
+        )
+        return [
             {"role" : "system", "content": system_message},
             {"role" : "user" , "content" : user_content}
-        ]    
-        article = self.call_openai(messages,max_tokens= 1000)
-        return article
\ No newline at end of file
+        ]
+
+    def outline_sections(self,outline):
+        """The outline's sections when it is long enough to write section by section, else None"""
+        sections = parse_outline(outline) if outline else []
+        return sections if len(sections) >= self.min_sections else None
+
+    async def _section_stream(self,topic,outline,sections,index,slots):
+        # Headings are added here so the refiner can split the article back into sections
+        separator = "\n\n" if index else ""
+        yield f"{separator}## {sections[index].title}\n\n"
+        async with slots:
+            messages = self.fit_messages(self.build_section_messages(topic, outline, sections, index))
+            async for chunk in self.astream(messages, temperature=self.temperature, max_tokens=self.section_max_tokens):
+                yield chunk
+
+    async def astream_execute(self,topic,outline=None):
+        """Streams the article; long outlines are written section by section in parallel and streamed in order"""
+        sections = self.outline_sections(outline)
+        if sections is None:
+            async for chunk in super().astream_execute(topic, outline):
+                yield chunk
+            return
+        # Taken in order, so the early sections (the ones being shown) are written first
+        slots = asyncio.Semaphore(self.section_concurrency)
+        streams = [self._section_stream(topic, outline, sections, i, slots) for i in range(len(sections))]
+        async for chunk in merge_in_order(streams):
+            yield chunk
+
+    async def aexecute(self,topic,outline=None):
+        if self.outline_sections(outline) is None:
+            return await super().aexecute(topic, outline)
+        return "".join([chunk async for chunk in self.astream_execute(topic, outline)])
@@ -1,22 +1,28 @@
 from .agent_base import AgentBase
+from .token_budget import fit_text
+from .validation import JSON_INSTRUCTIONS, JsonValidation
 
-class WriteArticleValidatorAgent(AgentBase):
-    def __init__(self, max_retries=2, verbose=True):
-        super().__init__(name="WriteArticleValidatorAgent",max_retries= max_retries,verbose = verbose)
+class WriteArticleValidatorAgent(JsonValidation, AgentBase):
+    max_tokens = 512
+    input_token_budget = 3000
 
-    def execute(self,topic,article):
+    def __init__(self, max_retries=2, verbose=True, **kwargs):
+        super().__init__(name="WriteArticleValidatorAgent",max_retries= max_retries,verbose = verbose, **kwargs)
+
+    def build_messages(self,topic,article):
         system_message = "You are an expert AI assistant that validates historical articles."
+        article = fit_text(article, self.input_room(topic))
         user_content = (
             "Given the topic ant the historical article, evaluate whether the historical article comprehensively covers the topic, follow a logical stucture and maintains academic standarts.\n"
-            "Provide a brief analysis and rate the article on a scale of 1 to 5, where 5 indicates an excellent quality.\n\n"
+            "Provide a brief analysis and rate the article on a scale of 1 to 5, where 5 indicates an excellent quality.\n"
+            "List the problems that need fixing, naming the section each one is in.\n"
+            f"{JSON_INSTRUCTIONS}\n\n"
             f"Topic: {topic}\n\n"
             f"Article: \n{article}\n\n"
-            "Validation"
+            "Validation (JSON):"
         )
 
-        messages = [
+        return [
             {"role" : "system", "content": system_message},
             {"role" : "user" , "content" : user_content}
-        ]    
-        validation = self.call_openai(messages,max_tokens= 512)
-        return validation
\ No newline at end of file
+        ]
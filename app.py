@@ -1,10 +1,83 @@
+import os
+import threading
+import time
+from collections import deque
 import streamlit as st
-from agents import AgentManager
+from agents import AgentManager, ResponseCache, RateLimiter, RetrievalIndex, SimilarityCache, summarize_pipeline, events_pipeline, parse_validation, final_article, load_env
+from agents.pipeline import ARTICLE_REFINE_ROUNDS, refinement_stages
+from agents.token_budget import estimate_tokens
+from agents.metrics import metrics
+from agents.events_batch import parse_year_centuries, find_events_batch
 from utils.logger import logger
-from utils.file_validator import file_upload_section
-from dotenv import load_dotenv
+from utils.file_validator import FileValidator, file_upload_section
 
-load_dotenv()
+# Most in-flight lookups a single events batch may have
+EVENTS_BATCH_CONCURRENCY = int(os.getenv("EVENTS_BATCH_CONCURRENCY", "8"))
+
+# Documents in this folder are added to the retrieval index at startup
+DOCS_DIR = "docs"
+
+def ingest_directory(index, directory):
+    """Adds every readable file in directory to the index; unchanged files are skipped by content hash"""
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path) or os.path.splitext(name)[1].lower() not in FileValidator.ALLOWED_EXTENSIONS:
+            continue
+        content, error = FileValidator.read_path(path)
+        if error:
+            logger.warning(f"Skipping {path} for the retrieval index: {error}")
+        elif content:
+            index.add(content, source=name)
+
+def index_in_background(index, content, source):
+    """Adds an uploaded document to the index on a worker thread, so the page does not wait for it"""
+    def add():
+        try:
+            index.add(content, source=source)
+        except Exception as e:
+            logger.error(f"Indexing {source} failed: {e}")
+    threading.Thread(target=add, name="index-upload", daemon=True).start()
+
+@st.cache_resource
+def get_agent_manager():
+    """
+    Builds the agent manager once per process; every session and rerun shares it,
+    together with its response cache and rate limiter.
+    """
+    load_env()
+    response_cache = ResponseCache(
+        max_entries=256,
+        ttl_seconds=24 * 3600,
+        db_path=os.getenv("RESPONSE_CACHE_DB"),
+        # Repeated clicks with the same input are served from here instead of calling the model again
+        cache_nondeterministic=True
+    )
+    rate_limiter = RateLimiter(
+        requests_per_minute=int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")),
+        tokens_per_minute=int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000"))
+    )
+    # Per-call metrics: Prometheus text on METRICS_PORT, and/or a JSON snapshot file
+    if os.getenv("METRICS_PORT"):
+        metrics.start_http_server(int(os.getenv("METRICS_PORT")))
+    if os.getenv("METRICS_JSON_PATH"):
+        metrics.start_periodic_dump(os.getenv("METRICS_JSON_PATH"), interval_seconds=60)
+    # Local BM25 index over docs/ and every uploaded document, grounding the events lookups
+    index = RetrievalIndex(os.getenv("RETRIEVAL_INDEX_DIR", os.path.join("data", "index")))
+    ingest_directory(index, DOCS_DIR)
+    # Near-duplicate requests (same dates, almost the same document) reuse earlier results and validations
+    similarity_cache = SimilarityCache(
+        max_entries=int(os.getenv("SIMILARITY_CACHE_SIZE", "256")),
+        threshold=float(os.getenv("SIMILARITY_THRESHOLD", "0.9")),
+        ttl_seconds=24 * 3600
+    )
+    # Article runs are background jobs recorded here, so a refresh or rerun does not lose them
+    job_db = os.getenv("JOB_DB", os.path.join("data", "jobs.sqlite3"))
+    os.makedirs(os.path.dirname(job_db) or ".", exist_ok=True)
+    return AgentManager(max_retries=2,verbose=True,cache=response_cache,rate_limiter=rate_limiter,metrics=metrics,
+                        index=index,similarity_cache=similarity_cache,job_db=job_db,
+                        job_workers=int(os.getenv("JOB_WORKERS", "2")))
 
 def main():
     st.set_page_config(page_title= "Historical Agent AI System", layout="wide")
@@ -18,7 +91,17 @@ def main():
         ]
     )
 
-    agent_manager = AgentManager(max_retries=2,verbose=True)
+    agent_manager = get_agent_manager()
+
+    cache_stats = agent_manager.cache.stats()
+    st.sidebar.caption(
+        f"Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%} hit rate)"
+    )
+    similar_stats = agent_manager.similarity_cache.stats()
+    st.sidebar.caption(f"Similar-request cache: {similar_stats['hits']} hits / {similar_stats['misses']} misses")
+    index_stats = agent_manager.index.stats()
+    st.sidebar.caption(f"Document index: {index_stats['documents']} documents, {index_stats['passages']} passages")
 
     if task == "Summarize Historical Text":
         summarize_section(agent_manager)
@@ -29,6 +112,97 @@ def main():
     elif task == "Find events on a given Year/Century":
         historical_events_finder(agent_manager)
 
+def render_pipeline(pipeline, agent_manager, sections, spinner_text):
+    """
+    Runs a pipeline and renders each stage as soon as it produces output;
+    streaming stages are written token by token with st.write_stream.
+    sections: list of (stage name, subheader, error label) in display order
+    Returns {stage name: output} for the stages that succeeded.
+    """
+    containers = {stage: st.container() for stage, _, _ in sections}
+    labels = {stage: (title, error_label) for stage, title, error_label in sections}
+    events = pipeline.iter_run(agent_manager, stream=True)
+    # Events from other stages that arrive while one stage is streaming wait here
+    pending = deque()
+
+    def next_event(stage=None):
+        for event in pending:
+            if stage is None or event.stage == stage:
+                pending.remove(event)
+                return event
+        for event in events:
+            if stage is None or event.stage == stage:
+                return event
+            pending.append(event)
+        return None
+
+    def stage_chunks(first):
+        yield first.chunk
+        while True:
+            event = next_event(first.stage)
+            if event is None:
+                return
+            if event.done:
+                pending.appendleft(event)
+                return
+            yield event.chunk
+
+    streamed = set()
+    outputs = {}
+    started = time.perf_counter()
+    with st.spinner(spinner_text):
+        while (event := next_event()) is not None:
+            title, error_label = labels[event.stage]
+            with containers[event.stage]:
+                if not event.done:
+                    st.subheader(title)
+                    st.write_stream(stage_chunks(event))
+                    streamed.add(event.stage)
+                elif event.error is not None:
+                    st.error(f"{error_label}: {event.error}")
+                elif event.output is not None:
+                    outputs[event.stage] = event.output
+                    if event.stage not in streamed:
+                        st.subheader(title)
+                        st.write(event.output)
+                    st.caption(f"{title.rstrip(':')} took {event.elapsed:.1f}s")
+    st.caption(f"Total time: {time.perf_counter() - started:.1f}s")
+    return outputs
+
+def render_cached(outputs, sections):
+    """Shows a result reused from the similar-request cache, laid out like render_pipeline"""
+    st.info("Reused the result of an earlier, near-identical request.")
+    for stage, title, _ in sections:
+        if stage in outputs:
+            st.subheader(title)
+            st.write(outputs[stage])
+
+SUMMARY_SECTIONS = [
+    ("summary", "Summary:", "Error"),
+    ("validation", "Validation:", "Validation Error"),
+]
+
+def article_sections(rounds):
+    """Sections of an article job: the draft, then one refined article and validation per refinement round"""
+    sections = [
+        ("draft", "Draft Article:", "Error"),
+        ("draft_validation", "Draft Validation:", "Draft Validation Error"),
+    ]
+    for n, (refined, validation) in enumerate(refinement_stages(rounds), start=1):
+        if n == 1:
+            sections += [(refined, "Refined Article:", "Refinement Error"), (validation, "Validation:", "Validation Error")]
+        else:
+            sections += [(refined, f"Revised Article (round {n}):", f"Revision Error (round {n})"),
+                         (validation, f"Revision Validation (round {n}):", f"Revision Validation Error (round {n})")]
+    return sections
+
+ARTICLE_SECTIONS = article_sections(ARTICLE_REFINE_ROUNDS)
+
+EVENTS_SECTIONS = [
+    ("events", "Historical Events:", "Error"),
+    ("validation", "Validation:", "Validation Error"),
+]
+
 def summarize_section(agent_manager):
     st.header("Summarize Historical Text")
     
@@ -36,6 +210,7 @@ def summarize_section(agent_manager):
     input_method = st.radio("Choose input method:", ["Type Text", "Upload File"], key="summarize_input")
     
     text = None
+    filename = None
     
     if input_method == "Type Text":
         text = st.text_area("Enter historical text to summarize:", height=200, key="summarize_text")
@@ -52,29 +227,52 @@ def summarize_section(agent_manager):
                 st.text_area("File content:", value=text, height=200, disabled=True)
     
     if st.button("Summarize"):
-        if text:
-            main_agent = agent_manager.get_agent("summarize")
-            validator_agent = agent_manager.get_agent("summarize_validator")
-            with st.spinner("Summarizing..."):
-                try:
-                    summary = main_agent.execute(text)
-                    st.subheader("Summary:")
-                    st.write(summary)
-                except Exception as e:
-                    st.error(f"Error: {e}")
-                    logger.error(f"SummarizeAgent Error: {e}")
-                    return
-
-            with st.spinner("Validating summary..."):
-                try:
-                    validation = validator_agent.execute(original_text=text, summary=summary)
-                    st.subheader("Validation:")
-                    st.write(validation)
-                except Exception as e:
-                    st.error(f"Validation Error: {e}")
-                    logger.error(f"SummarizeValidatorAgent Error: {e}")
-        else:
+        if not text:
             st.warning("Please enter some text or upload a file to summarize.")
+            return
+        if filename:
+            # Uploaded documents become sources for event searches; known ones are skipped by the index
+            index_in_background(agent_manager.index, text, filename)
+        similarity_cache = agent_manager.similarity_cache
+        cached = similarity_cache.get("summarize", text, as_document=True)
+        if cached is not None:
+            render_cached(cached, SUMMARY_SECTIONS)
+            return
+        # Map-reduce only when one prompt cannot hold the text; chunk_tokens is just the chunk size
+        if estimate_tokens(text) > agent_manager.get_agent("summarize").input_room():
+            outputs = summarize_large_text(text, agent_manager)
+        else:
+            outputs = render_pipeline(summarize_pipeline(text), agent_manager, SUMMARY_SECTIONS, "Summarizing and validating...")
+        if len(outputs) == len(SUMMARY_SECTIONS):
+            similarity_cache.set("summarize", text, outputs, as_document=True)
+
+def summarize_large_text(text, agent_manager):
+    """Map-reduce summary for documents too large for a single prompt; returns the outputs that succeeded"""
+    main_agent = agent_manager.get_agent("summarize")
+    validator_agent = agent_manager.get_agent("summarize_validator")
+    with st.spinner("Summarizing document section by section..."):
+        try:
+            summary, chunk_summaries = main_agent.summarize_chunked(text)
+            st.subheader("Summary:")
+            st.write(summary)
+            with st.expander(f"📑 Section summaries ({len(chunk_summaries)})"):
+                for i, part in enumerate(chunk_summaries, start=1):
+                    st.markdown(f"**Section {i}:** {part}")
+        except Exception as e:
+            st.error(f"Error: {e}")
+            logger.error(f"SummarizeAgent Error: {e}")
+            return {}
+
+    with st.spinner("Validating summary..."):
+        try:
+            validation = validator_agent.execute(original_text=text, summary=summary, chunk_summaries=chunk_summaries)
+            st.subheader("Validation:")
+            st.write(validation)
+        except Exception as e:
+            st.error(f"Validation Error: {e}")
+            logger.error(f"SummarizeValidatorAgent Error: {e}")
+            return {"summary": summary}
+    return {"summary": summary, "validation": validation}
 
 def write_and_refine_article_section(agent_manager):
     st.header("Write and Refine Historical Article")
@@ -95,46 +293,79 @@ def write_and_refine_article_section(agent_manager):
             key="outline_file"
         )
         if content:
+            # Not indexed: an outline is the user's plan, not a source for event searches
             outline = content
             with st.expander("📄 View uploaded outline"):
                 st.text_area("Outline content:", value=outline, height=150, disabled=True)
     
+    sections = agent_manager.get_agent("write_article").outline_sections(outline)
+    if sections:
+        st.caption(f"The outline has {len(sections)} sections; they are written in parallel.")
+
     if st.button("Write and Refine Article"):
         if topic:
-            writer_agent = agent_manager.get_agent("write_article")
-            refiner_agent = agent_manager.get_agent("refiner")
-            validator_agent = agent_manager.get_agent("validator")
-            with st.spinner("Writing article..."):
-                try:
-                    draft = writer_agent.execute(topic, outline)
-                    st.subheader("Draft Article:")
-                    st.write(draft)
-                except Exception as e:
-                    st.error(f"Error: {e}")
-                    logger.error(f"WriteArticleAgent Error: {e}")
-                    return
-
-            with st.spinner("Refining article..."):
-                try:
-                    refined_article = refiner_agent.execute(draft)
-                    st.subheader("Refined Article:")
-                    st.write(refined_article)
-                except Exception as e:
-                    st.error(f"Refinement Error: {e}")
-                    logger.error(f"RefinerAgent Error: {e}")
-                    return
-
-            with st.spinner("Validating article..."):
-                try:
-                    validation = validator_agent.execute(topic=topic, article=refined_article)
-                    st.subheader("Validation:")
-                    st.write(validation)
-                except Exception as e:
-                    st.error(f"Validation Error: {e}")
-                    logger.error(f"ValidatorAgent Error: {e}")
+            job_id = agent_manager.submit_job("article", topic=topic, outline=outline or None)
+            # Kept in the URL as well, so a browser refresh finds the job again
+            st.session_state["article_job"] = job_id
+            st.query_params["job"] = job_id
         else:
             st.warning("Please enter a topic for the historical article.")
 
+    finished = [job for job in agent_manager.jobs.recent(kind="article") if job.status == "done"]
+    if finished:
+        labels = {job.id: f"{job.params['topic']} ({time.strftime('%Y-%m-%d %H:%M', time.localtime(job.updated))})" for job in finished}
+        # Applied only when the selection changes, so a later submission is not replaced by the old article
+        st.selectbox("Or open a finished article:", [None] + list(labels), format_func=lambda job_id: labels.get(job_id, "—"),
+                     key="article_history", on_change=open_article_job)
+
+    job_id = st.session_state.get("article_job") or st.query_params.get("job")
+    if job_id:
+        job = agent_manager.get_job(job_id)
+        if job is None:
+            st.warning(f"Article job {job_id} was not found (it may have expired).")
+        elif job.finished:
+            render_job(job, ARTICLE_SECTIONS)
+        else:
+            # Only this fragment reruns while polling, not the whole page
+            st.fragment(poll_job, run_every=1.0)(agent_manager, job_id, ARTICLE_SECTIONS)
+
+def open_article_job():
+    chosen = st.session_state.get("article_history")
+    if chosen:
+        st.session_state["article_job"] = chosen
+        st.query_params["job"] = chosen
+
+def poll_job(agent_manager, job_id, sections):
+    job = agent_manager.get_job(job_id)
+    render_job(job, sections)
+    if job.finished:
+        # A full rerun renders the final state without the polling fragment
+        st.rerun()
+
+def render_job(job, sections):
+    """Shows a background job: finished stages, text streamed so far by running ones, and errors"""
+    for stage, title, error_label in sections:
+        if stage in job.outputs:
+            st.subheader(title)
+            st.write(job.outputs[stage])
+        elif stage in job.errors:
+            st.error(f"{error_label}: {job.errors[stage]}")
+        elif stage in job.partial:
+            st.subheader(title)
+            st.write(job.partial[stage] + " ▌")
+    if "job" in job.errors:
+        st.error(f"Error: {job.errors['job']}")
+    if job.status == "done" and job.kind == "article":
+        if "refined" not in job.outputs and ARTICLE_REFINE_ROUNDS > 0:
+            score = parse_validation(job.outputs.get("draft_validation", "")).score
+            st.success(f"The draft already scored {score}/5, so it was kept without refinement.")
+        if final_article(job.outputs):
+            st.download_button("Download the final article", final_article(job.outputs), file_name=f"article-{job.id}.md", mime="text/markdown")
+    if job.finished:
+        st.caption(f"Job {job.id} {job.status} in {job.updated - job.created:.1f}s")
+    else:
+        st.caption(f"Job {job.id} is {job.status}... ({time.time() - job.created:.0f}s)")
+
 def historical_events_finder(agent_manager):
     st.header("Find events on a given Year/Century")
     
@@ -142,6 +373,7 @@ def historical_events_finder(agent_manager):
     input_method = st.radio("Choose input method:", ["Type Date", "Upload File"], key="events_input")
     
     year_century = None
+    dates = []
     
     if input_method == "Type Date":
         year_century = st.text_area("Enter Year/Century to get important events:", height=100, key="events_text")
@@ -154,33 +386,67 @@ def historical_events_finder(agent_manager):
         )
         if content:
             year_century = content
+            dates = parse_year_centuries(content)
+            st.info(f"Found {len(dates)} unique year(s)/centuries in the file")
             with st.expander("📄 View uploaded dates"):
                 st.text_area("File content:", value=year_century, height=100, disabled=True)
     
+    index_only = st.checkbox(
+        "Answer from my documents only (no model call)",
+        help="Lists the passages of uploaded documents and docs/ that mention the year/century",
+        key="events_index_only"
+    )
+
     if st.button("Find Events"):
-        if year_century:
-            main_agent = agent_manager.get_agent("historical_events")
-            validator_agent = agent_manager.get_agent("historical_events_validator")
-            with st.spinner("Searching events..."):
-                try:
-                    historical_events = main_agent.execute(year_century)
-                    st.subheader("Historical Events:")
-                    st.write(historical_events)
-                except Exception as e:
-                    st.error(f"Error: {e}")
-                    logger.error(f"HistoricalEventAgent Error: {e}")
-                    return
-
-            with st.spinner("Validating historical events..."):
-                try:
-                    validation = validator_agent.execute(year_century=year_century, historical_events=historical_events)
-                    st.subheader("Validation:")
-                    st.write(validation)
-                except Exception as e:
-                    st.error(f"Validation Error: {e}")
-                    logger.error(f"EventsFinderValidatorAgent Error: {e}")
+        if index_only and year_century:
+            for date in dates or [year_century]:
+                answer = agent_manager.index.answer(date)
+                if answer:
+                    st.markdown(answer)
+                else:
+                    st.info(f"No indexed document mentions {date.strip()}.")
+        elif len(dates) > 1:
+            events_batch_section(dates, agent_manager)
+        elif year_century:
+            similarity_cache = agent_manager.similarity_cache
+            cached = similarity_cache.get("events", year_century)
+            if cached is not None:
+                render_cached(cached, EVENTS_SECTIONS)
+                return
+            outputs = render_pipeline(
+                events_pipeline(year_century, context=agent_manager.index.context_for(year_century) or None),
+                agent_manager,
+                EVENTS_SECTIONS,
+                "Searching and validating historical events..."
+            )
+            if len(outputs) == len(EVENTS_SECTIONS):
+                similarity_cache.set("events", year_century, outputs)
         else:
             st.warning("Please enter Year/Century or upload a file.")
 
+def events_batch_section(dates, agent_manager):
+    """Looks up and validates many years/centuries concurrently and shows them as a table"""
+    main_agent = agent_manager.get_agent("historical_events")
+    validator_agent = agent_manager.get_agent("historical_events_validator")
+    progress = st.progress(0.0, text=f"Searching events for {len(dates)} dates...")
+    rows = [None] * len(dates)
+    results = find_events_batch(
+        main_agent,
+        validator_agent,
+        dates,
+        max_concurrency=EVENTS_BATCH_CONCURRENCY,
+        index=agent_manager.index,
+        cache=agent_manager.similarity_cache
+    )
+    for done, (index, row) in enumerate(results, start=1):
+        rows[index] = row
+        progress.progress(done / len(dates), text=f"Processed {done}/{len(dates)} dates")
+
+    failed = [row for row in rows if row["Error"]]
+    if failed:
+        st.warning(f"{len(failed)} of {len(dates)} lookups failed, see the Error column.")
+    st.subheader("Historical Events:")
+    st.dataframe(rows, use_container_width=True)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Import-time report for the entry points, to keep cold starts of the app, the CLI
+and job workers cheap.
+
+    python -m benchmarks.import_profile
+    python -m benchmarks.import_profile --targets agents,cli --top 15 --budget-ms 150
+
+Each target is imported in a fresh interpreter: once plainly to time it (best of
+--repeat runs), and once under `python -X importtime` to show which of the modules
+it pulls in cost the most.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TARGETS = ("agents", "agents.pipeline", "utils.file_validator", "cli", "app")
+
+_TIMER = "import time; started = time.perf_counter(); import {target}; print(time.perf_counter() - started)"
+
+
+def run_python(args):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def wall_time(target, repeat):
+    """Best wall-clock import time of target over repeat fresh interpreters, in seconds"""
+    return min(float(run_python(["-c", _TIMER.format(target=target)]).stdout.split()[-1]) for _ in range(repeat))
+
+
+def import_breakdown(target):
+    """(module, depth, self µs, cumulative µs) for every module target imports, from -X importtime"""
+    rows = []
+    for line in run_python(["-X", "importtime", "-c", f"import {target}"]).stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Names are indented two spaces per nesting level, after one leading space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def subtree(rows, target):
+    """The rows imported on behalf of target: children are listed before their parent"""
+    end = max(i for i, row in enumerate(rows) if row[1] == 0 and row[0] == target)
+    start = end
+    while start > 0 and rows[start - 1][1] > 0:
+        start -= 1
+    return rows[start:end + 1]
+
+
+def profile(target, repeat=3, top=10):
+    # Interpreter startup (site, encodings) is listed too but is not the target's doing
+    rows = subtree(import_breakdown(target), target)
+    # Heaviest modules directly below the target: the imports worth deferring
+    children = sorted((row for row in rows if row[1] == 1), key=lambda row: row[3], reverse=True)
+    return {
+        "target": target,
+        "wall_ms": wall_time(target, repeat) * 1000,
+        "modules": len(rows),
+        "top": [{"module": name, "cumulative_ms": cumulative / 1000, "self_ms": self_us / 1000}
+                for name, _, self_us, cumulative in children[:top]],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time profile of the app, CLI and agents package")
+    parser.add_argument("--targets", default=",".join(DEFAULT_TARGETS), help="comma separated modules to import")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per target; the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="heaviest direct imports listed per target")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if any target takes longer to import")
+    parser.add_argument("--json", dest="json_path", default=None, help="write the full report here")
+    args = parser.parse_args(argv)
+
+    report = []
+    for target in [t for t in args.targets.split(",") if t]:
+        try:
+            row = profile(target, args.repeat, args.top)
+        except subprocess.CalledProcessError as e:
+            print(f"{target}: import failed\n{e.stderr.strip()}", file=sys.stderr)
+            return 1
+        report.append(row)
+        print(f"{target:<22} {row['wall_ms']:8.1f} ms  ({row['modules']} modules)")
+        for child in row["top"]:
+            print(f"    {child['module']:<40} {child['cumulative_ms']:8.1f} ms")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.budget_ms is not None:
+        slow = [row for row in report if row["wall_ms"] > args.budget_ms]
+        for row in slow:
+            print(f"FAIL {row['target']}: {row['wall_ms']:.1f} ms > {args.budget_ms} ms budget")
+        if slow:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
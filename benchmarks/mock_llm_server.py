@@ -0,0 +1,167 @@
+"""
+Local stand-in for the Groq / OpenAI chat completions API, for offline benchmarks.
+
+Run standalone:
+    python -m benchmarks.mock_llm_server --port 8765 --latency 0.3 --tokens-per-second 200
+then point the agents at it with GROQ_BASE_URL=http://127.0.0.1:8765
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("the empire council treaty king war trade city church reform army river "
+         "century revolt dynasty harbor plague senate crown border merchant").split()
+
+
+class MockConfig:
+    def __init__(self, latency=0.2, tokens_per_second=200.0, completion_tokens=200,
+                 error_rate=0.0, rate_limit_share=0.5, retry_after=0.5, json_scores=(3, 4, 5), seed=None):
+        self.latency = latency                       # seconds before the first token
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens   # capped by the request's max_tokens
+        self.error_rate = error_rate                 # share of requests that fail
+        self.rate_limit_share = rate_limit_share     # share of failures that are 429s (the rest are 500s)
+        self.retry_after = retry_after
+        self.json_scores = json_scores               # validator scores drawn for JSON-mode replies
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+
+
+def _make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            try:
+                self._handle_post()
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up (e.g. a hedged request that lost the race)
+                pass
+
+        def _handle_post(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+            with config.lock:
+                config.requests += 1
+                fail = config.random.random() < config.error_rate
+                rate_limited = config.random.random() < config.rate_limit_share
+                if fail:
+                    config.errors += 1
+            if fail:
+                if rate_limited:
+                    self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                                    {"retry-after": str(config.retry_after)})
+                else:
+                    self._send_json(500, {"error": {"message": "Injected server error"}})
+                return
+
+            prompt_chars = sum(len(json.dumps(message.get("content", ""))) for message in request.get("messages", []))
+            prompt_tokens = prompt_chars // 4 + 1
+            completion_tokens = min(config.completion_tokens, request.get("max_tokens") or config.completion_tokens)
+            with config.lock:
+                words = [config.random.choice(WORDS) for _ in range(completion_tokens)]
+                if (request.get("response_format") or {}).get("type") == "json_object":
+                    words = self._validation_json(words).split(" ")
+            time.sleep(config.latency)
+
+            base = {"id": f"mock-{config.requests}", "created": int(time.time()), "model": request.get("model", "mock")}
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                     "total_tokens": prompt_tokens + len(words)}
+            if request.get("stream"):
+                self._stream(base, words, usage)
+                return
+            time.sleep(len(words) / config.tokens_per_second)
+            self._send_json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": " ".join(words)},
+            }]))
+
+        @staticmethod
+        def _validation_json(words):
+            """A validator-shaped JSON reply; low scores come with a general issue"""
+            score = config.random.choice(config.json_scores)
+            issues = [] if score >= 4 else [{"section": "", "problem": " ".join(words[:8])}]
+            return json.dumps({"score": score, "summary": " ".join(words[8:]), "issues": issues})
+
+        def _stream(self, base, words, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(data):
+                payload = f"data: {data}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+                self.wfile.flush()
+
+            batch = 5
+            for start in range(0, len(words), batch):
+                piece = " ".join(words[start:start + batch]) + " "
+                send(json.dumps(dict(base, object="chat.completion.chunk", choices=[{
+                    "index": 0, "delta": {"content": piece}, "finish_reason": None,
+                }])))
+                time.sleep(len(words[start:start + batch]) / config.tokens_per_second)
+            send(json.dumps(dict(base, object="chat.completion.chunk", choices=[{
+                "index": 0, "delta": {}, "finish_reason": "stop",
+            }], x_groq={"usage": usage})))
+            send("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_mock_server(port=0, **config_kwargs):
+    """Starts the mock server on a background thread; returns (server, base_url, config)"""
+    config = MockConfig(**config_kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Groq/OpenAI chat completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server, base_url, _ = start_mock_server(
+        port=args.port,
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+    )
+    print(f"Mock LLM server listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
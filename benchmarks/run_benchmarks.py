@@ -0,0 +1,251 @@
+"""
+Offline benchmarks for the agent flows and the upload extraction path.
+
+Every AgentManager flow runs against the local mock server in
+benchmarks/mock_llm_server.py, so no network access or API key is needed:
+
+    python -m benchmarks.run_benchmarks --concurrency 1,4,16 --requests 32
+    python -m benchmarks.run_benchmarks --max-p95 5 --json bench_output.json   # CI gate
+    python -m benchmarks.run_benchmarks --backends 3 --hedge   # routing and hedging across stub endpoints
+
+Reports p50/p95/p99 latency and requests/sec per flow and concurrency level,
+extraction time for synthetic PDF/DOCX/CSV files, and peak RSS.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import sys
+import time
+
+from benchmarks.mock_llm_server import start_mock_server
+
+FLOWS = ("summarize", "article", "events")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its finished children (ru_maxrss is KB on Linux, bytes on macOS)"""
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return max(own, children)
+
+
+def make_pipeline(flow, i):
+    from agents import summarize_pipeline, article_pipeline, events_pipeline
+    # Distinct inputs so nothing is served from a cache
+    if flow == "summarize":
+        return summarize_pipeline(f"Document {i}. " + "The council met and the treaty was signed. " * 200)
+    if flow == "article":
+        return article_pipeline(f"The fall of city number {i}", "1. Background\n2. Siege\n3. Aftermath")
+    return events_pipeline(str(1000 + i))
+
+
+def model_usage():
+    """(model calls, prompt + completion tokens) recorded so far across every agent"""
+    from agents.metrics import metrics
+    agents = metrics.to_dict().values()
+    return (sum(agent["requests"] for agent in agents),
+            sum(agent["prompt_tokens"] + agent["completion_tokens"] for agent in agents))
+
+
+async def run_flow(agent_manager, flow, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    calls_before, tokens_before = model_usage()
+    latencies = []
+    failures = 0
+
+    async def one(i):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            result = await make_pipeline(flow, i).arun(agent_manager)
+            latencies.append(time.perf_counter() - started)
+            if not result.ok:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    calls, tokens = model_usage()
+    return {
+        "flow": flow,
+        "concurrency": concurrency,
+        "requests": requests,
+        "failures": failures,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "rps": requests / elapsed if elapsed else 0.0,
+        # Refinement is skipped for drafts that validate well, so article runs vary here
+        "calls_per_run": (calls - calls_before) / requests,
+        "tokens_per_run": (tokens - tokens_before) / requests,
+    }
+
+
+def make_csv(target_bytes):
+    row = "1066,Battle of Hastings,England,William the Conqueror defeats Harold II\n"
+    return ("year,event,place,description\n" + row * (target_bytes // len(row) + 1)).encode("utf-8")
+
+
+def make_docx(target_bytes):
+    from docx import Document
+    doc = Document()
+    paragraph = "The assembly debated the new tax on grain while the envoys waited at the harbor. " * 4
+    # python-docx compresses well, so aim for the amount of raw text rather than the file size
+    for _ in range(target_bytes // len(paragraph) + 1):
+        doc.add_paragraph(paragraph)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def make_pdf(target_bytes):
+    """Hand-written minimal PDF with one Helvetica text stream per page"""
+    line = "The assembly debated the new tax on grain while the envoys waited."
+    page_stream = ("BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for _ in range(60)) + " ET").encode("latin-1")
+    pages = max(1, target_bytes // len(page_stream))
+    font_id = 3 + 2 * pages
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(pages))}] /Count {pages} >>".encode("ascii"),
+    ]
+    for i in range(pages):
+        objects.append((f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {4 + 2 * i} 0 R "
+                        f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>").encode("ascii"))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(page_stream) + page_stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    out.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+class _NamedBytes(io.BytesIO):
+    """Mimics Streamlit's UploadedFile closely enough for FileValidator"""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def run_extraction(size_mb):
+    from utils.file_validator import FileValidator
+    results = []
+    for extension, factory in ((".csv", make_csv), (".docx", make_docx), (".pdf", make_pdf)):
+        data = factory(int(size_mb * 1024 * 1024))
+        started = time.perf_counter()
+        content, error = FileValidator.read_file_content(_NamedBytes(f"synthetic{extension}", data))
+        results.append({
+            "format": extension,
+            "file_mb": len(data) / (1024 * 1024),
+            "seconds": time.perf_counter() - started,
+            "chars": len(content or ""),
+            "error": error,
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmarks for the agent flows")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="comma separated subset of: " + ", ".join(FLOWS))
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=16, help="flow runs per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.1, help="mock time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=500.0, help="mock generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=100, help="mock reply length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of mock requests that fail")
+    parser.add_argument("--backends", type=int, default=1, help="mock endpoints; endpoint i is (i+1)x slower")
+    parser.add_argument("--hedge", action="store_true", help="send a hedged request after the p95 latency")
+    parser.add_argument("--extraction-mb", type=float, default=2.0, help="synthetic upload size, 0 to skip")
+    parser.add_argument("--max-p95", type=float, default=None, help="fail if any flow p95 exceeds this (s)")
+    parser.add_argument("--json", dest="json_path", default=None, help="write the full report here")
+    args = parser.parse_args(argv)
+
+    servers = [
+        start_mock_server(
+            latency=args.latency * (i + 1),
+            tokens_per_second=args.tokens_per_second / (i + 1),
+            completion_tokens=args.completion_tokens,
+            error_rate=args.error_rate,
+            seed=i,
+        )
+        for i in range(max(1, args.backends))
+    ]
+    os.environ["LLM_BACKENDS"] = json.dumps([
+        {"name": f"mock-{i}", "base_url": base_url, "api_key_env": "GROQ_API_KEY"}
+        for i, (_, base_url, _) in enumerate(servers)
+    ])
+    os.environ["LLM_HEDGE"] = "1" if args.hedge else "0"
+    os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+
+    from agents import AgentManager
+    from agents.agent_base import run_sync
+    from agents.backends import get_registry
+    from utils.logger import logger
+    logger.remove()
+
+    # No response cache: every run must reach the (mock) model
+    agent_manager = AgentManager(max_retries=3, verbose=False)
+    report = {"flows": [], "extraction": []}
+    for flow in [f for f in args.flows.split(",") if f]:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            row = run_sync(run_flow(agent_manager, flow, args.requests, concurrency))
+            report["flows"].append(row)
+            print(f"{flow:<10} c={concurrency:<3} p50={row['p50']:.3f}s p95={row['p95']:.3f}s "
+                  f"p99={row['p99']:.3f}s rps={row['rps']:.2f} calls/run={row['calls_per_run']:.2f} "
+                  f"tokens/run={row['tokens_per_run']:.0f} failures={row['failures']}/{row['requests']}")
+
+    if args.extraction_mb > 0:
+        for row in run_extraction(args.extraction_mb):
+            report["extraction"].append(row)
+            status = row["error"] or f"{row['chars']} chars"
+            print(f"extract {row['format']:<6} {row['file_mb']:.2f} MB in {row['seconds']:.3f}s ({status})")
+
+    report["peak_rss_mb"] = peak_rss_mb()
+    report["mock_requests"] = sum(mock.requests for _, _, mock in servers)
+    report["backends"] = get_registry().stats()
+    print(f"peak RSS {report['peak_rss_mb']:.1f} MB, {report['mock_requests']} mock requests")
+    if len(servers) > 1 or args.hedge:
+        for name, stats in report["backends"]["backends"].items():
+            print(f"backend {name:<8} requests={stats['requests']} failures={stats['failures']} "
+                  f"latency={stats['latency_seconds']:.3f}s ttft={stats['ttft_seconds']:.3f}s")
+        print(f"hedged {report['backends']['hedged']} requests, {report['backends']['hedge_wins']} won by the hedge")
+    for server, _, _ in servers:
+        server.shutdown()
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_p95 is not None:
+        slow = [row for row in report["flows"] if row["p95"] > args.max_p95]
+        for row in slow:
+            print(f"FAIL {row['flow']} c={row['concurrency']}: p95 {row['p95']:.3f}s > {args.max_p95}s")
+        if slow:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Headless batch runner for the agent flows, for scheduled jobs that should not go through the UI.
+
+    python cli.py summarize --input-dir ./documents --output summaries.jsonl
+    python cli.py article --manifest topics.jsonl --output articles.jsonl --concurrency 8
+    python cli.py events --manifest dates.jsonl --output events.jsonl
+
+Manifest lines are JSON objects with an optional "id" and the flow's inputs:
+summarize {"text": ...} or {"path": ...}, article {"topic": ..., "outline": ...},
+events {"year_century": ...}. With --input-dir, every supported file becomes a
+summarize item, an article outline (topic = file name) or the dates it mentions.
+
+Results are appended to --output as one JSON line per item as soon as each
+finishes, with the validators' 1-5 scores per stage under "scores" (and, for articles, the
+last refined version under "final"). Rerunning with the same --output skips the items already done there,
+and model replies are kept in an SQLite response cache next to it, so stages that
+finished before an interruption are not sent to the model again.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from agents import AgentManager, ResponseCache, RateLimiter, ValidationResult, load_env, summarize_pipeline, article_pipeline, events_pipeline, final_article
+from agents.agent_base import run_sync
+from agents.events_batch import parse_year_centuries
+from agents.chunking import iter_text_chunks
+from agents.token_budget import estimate_tokens
+from utils.file_validator import FileValidator
+
+FLOWS = ("summarize", "article", "events")
+
+
+def iter_directory(flow, directory):
+    """Yields (id, loader) per item; loaders read the file only when the item runs"""
+    for path in sorted(Path(directory).rglob("*")):
+        if not path.is_file() or path.suffix.lower() not in FileValidator.ALLOWED_EXTENSIONS:
+            continue
+        item_id = str(path.relative_to(directory))
+        if flow == "events":
+            content, error = FileValidator.read_path(str(path))
+            if error:
+                yield item_id, _failed(error)
+                continue
+            for date in parse_year_centuries(content or ""):
+                yield f"{item_id}#{date}", _constant({"year_century": date})
+        elif flow == "summarize":
+            # Streamed from disk when the item runs, see run_summarize
+            yield item_id, _constant({"path": str(path)})
+        else:
+            yield item_id, _file_loader(path, lambda content, stem=path.stem: {"topic": stem.replace("_", " "), "outline": content})
+
+
+def iter_manifest(flow, manifest):
+    required = {"summarize": ("text", "path"), "article": ("topic",), "events": ("year_century",)}[flow]
+    with open(manifest, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                yield str(line_number), _failed(f"manifest line {line_number} is not valid JSON: {e}")
+                continue
+            if not isinstance(entry, dict):
+                yield str(line_number), _failed(f"manifest line {line_number} is not a JSON object")
+                continue
+            item_id = str(entry.get("id", line_number))
+            if not any(entry.get(key) for key in required):
+                yield item_id, _failed(f"manifest line {line_number} needs one of: {', '.join(required)}")
+            elif flow == "summarize" and not entry.get("text"):
+                yield item_id, _constant({"path": entry["path"]})
+            elif flow == "summarize":
+                yield item_id, _constant({"text": entry["text"]})
+            elif flow == "article":
+                yield item_id, _constant({"topic": entry["topic"], "outline": entry.get("outline")})
+            else:
+                yield item_id, _constant({"year_century": entry["year_century"]})
+
+
+def _constant(inputs):
+    return lambda: inputs
+
+
+def _failed(error):
+    def load():
+        raise ValueError(error)
+    return load
+
+
+def _file_loader(path, make_inputs):
+    def load():
+        content, error = FileValidator.read_path(str(path))
+        if error:
+            raise ValueError(error)
+        return make_inputs(content)
+    return load
+
+
+def load_done_ids(output):
+    """Ids already finished successfully in an earlier run's output"""
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line.decode("utf-8"))
+            except ValueError:
+                # A run killed mid-write leaves a partial last line, possibly cut inside a character
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+async def run_summarize(agent_manager, inputs):
+    """
+    Summarizes a text or a file. A text that fits one summarize prompt goes through the
+    pipeline; a larger one is cut into chunks that are summarized while the rest of the
+    file is still being parsed, so it is never held whole. Returns (outputs, errors).
+    """
+    summarizer = agent_manager.get_agent("summarize")
+    pieces = iter(FileValidator.iter_path(inputs["path"]) if "path" in inputs else [inputs["text"]])
+    room = summarizer.input_room()
+    # Reading until the text outgrows one prompt tells whether it needs map-reduce
+    head, head_tokens = [], 0
+    while head_tokens <= room and (piece := await asyncio.to_thread(next, pieces, None)) is not None:
+        head.append(piece)
+        head_tokens += estimate_tokens(piece)
+    if not "".join(head).strip():
+        raise ValueError("nothing to summarize: the text is empty")
+    if head_tokens <= room:
+        return await run_pipeline(agent_manager, summarize_pipeline("".join(head)))
+    chunks = iter_text_chunks(itertools.chain(head, pieces), chunk_tokens=summarizer.chunk_tokens, overlap_tokens=summarizer.overlap_tokens)
+    summary, chunk_summaries = await summarizer.asummarize_chunks(chunks)
+    # With chunk_summaries the validator checks against those, not the original text
+    validation = await agent_manager.get_agent("summarize_validator").aexecute(
+        original_text=None, summary=summary, chunk_summaries=chunk_summaries
+    )
+    return {"summary": summary, "validation": validation}, {}
+
+
+async def run_pipeline(agent_manager, pipeline):
+    result = await pipeline.arun(agent_manager)
+    errors = {stage: str(error) for stage, error in result.errors.items()}
+    errors.update({stage: "skipped after upstream failure" for stage in result.skipped})
+    return result.outputs, errors
+
+
+async def run_item(agent_manager, flow, inputs):
+    """Runs one flow the way the UI does; returns (outputs, errors)"""
+    if flow == "summarize":
+        return await run_summarize(agent_manager, inputs)
+    pipeline = {"article": article_pipeline, "events": events_pipeline}[flow](**inputs)
+    return await run_pipeline(agent_manager, pipeline)
+
+
+async def run_batch(agent_manager, flow, items, output, concurrency, done_ids):
+    """Runs items with at most concurrency in flight, appending each result to output as it finishes"""
+    counts = {"ok": 0, "failed": 0, "skipped": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    # Start on a fresh line if an interrupted run left half a record behind (checked in bytes,
+    # since the cut may fall inside a multibyte character)
+    partial_line = False
+    if os.path.exists(output) and os.path.getsize(output):
+        with open(output, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            partial_line = f.read(1) != b"\n"
+
+    with open(output, "a", encoding="utf-8") as out:
+        if partial_line:
+            out.write("\n")
+        async def run_one(item_id, load):
+            started = time.perf_counter()
+            try:
+                # File extraction can take a while, keep it off the event loop
+                inputs = await asyncio.to_thread(load)
+                outputs, errors = await run_item(agent_manager, flow, inputs)
+            except Exception as e:
+                outputs, errors = {}, {"item": str(e)}
+            finally:
+                semaphore.release()
+            status = "failed" if errors else "ok"
+            counts[status] += 1
+            scores = {stage: output.score for stage, output in outputs.items() if isinstance(output, ValidationResult)}
+            record = {"id": item_id, "flow": flow, "status": status, "outputs": outputs, "scores": scores,
+                      "errors": errors, "elapsed": round(time.perf_counter() - started, 3)}
+            if flow == "article":
+                # The last refined version, or the draft when it needed no refinement
+                record["final"] = final_article(outputs)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            logger.info(f"[cli] {item_id}: {status} in {record['elapsed']:.1f}s")
+
+        iterator = iter(items)
+        # Listing items may read files too (events), so that also happens off the event loop
+        while (entry := await asyncio.to_thread(next, iterator, None)) is not None:
+            item_id, load = entry
+            if item_id in done_ids:
+                counts["skipped"] += 1
+                continue
+            # Waiting here keeps only `concurrency` items (and their texts) in memory
+            await semaphore.acquire()
+            task = asyncio.ensure_future(run_one(item_id, load))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the summarize / article / events flows without the UI")
+    parser.add_argument("flow", choices=FLOWS)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input-dir", help="directory of documents (searched recursively)")
+    source.add_argument("--manifest", help="JSONL file with one item per line")
+    parser.add_argument("--output", required=True, help="JSONL results file; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=4, help="items in flight at once")
+    parser.add_argument("--cache-db", default=None, help="SQLite response cache (default: <output>.cache.sqlite3)")
+    parser.add_argument("--no-resume", action="store_true", help="rerun items already in --output")
+    parser.add_argument("--verbose", action="store_true", help="log every item and model call to stderr")
+    args = parser.parse_args(argv)
+
+    load_env()
+    logger.remove()
+    logger.add(sys.stderr, level="INFO" if args.verbose else "WARNING")
+
+    response_cache = ResponseCache(
+        max_entries=256,
+        ttl_seconds=None,
+        db_path=args.cache_db or f"{args.output}.cache.sqlite3",
+        # Replies are reused on resume even though they were sampled
+        cache_nondeterministic=True
+    )
+    rate_limiter = RateLimiter(
+        requests_per_minute=int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")),
+        tokens_per_minute=int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000"))
+    )
+    agent_manager = AgentManager(max_retries=3, verbose=args.verbose, cache=response_cache, rate_limiter=rate_limiter)
+
+    items = iter_directory(args.flow, args.input_dir) if args.input_dir else iter_manifest(args.flow, args.manifest)
+    done_ids = set() if args.no_resume else load_done_ids(args.output)
+    started = time.perf_counter()
+    counts = run_sync(run_batch(agent_manager, args.flow, items, args.output, args.concurrency, done_ids))
+    print(
+        f"{args.flow}: {counts['ok']} ok, {counts['failed']} failed, {counts['skipped']} already done "
+        f"in {time.perf_counter() - started:.1f}s -> {args.output}",
+        file=sys.stderr
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import pytest
+
+from agents.events_batch import parse_year_centuries
+
+
+@pytest.mark.parametrize("content, expected", [
+    # Years
+    ("1066", ["1066"]),
+    ("1066 AD", ["1066"]),
+    ("AD 1066", ["1066"]),
+    ("476 CE", ["476"]),
+    ("500 BC", ["500 BC"]),
+    ("5000 BCE", ["5000 BC"]),
+    ("79 AD", ["79"]),
+    ("In 1066, the Normans crossed the Channel.", ["1066"]),
+    ("Battle of Hastings 1066", ["1066"]),
+    ("1914-1918", ["1914", "1918"]),
+    ("1066\n1453\n1066 AD", ["1066", "1453"]),
+    # Centuries
+    ("XI century", ["11th century"]),
+    ("11th century", ["11th century"]),
+    ("1st century BC", ["1st century BC"]),
+    ("21st century", ["21st century"]),
+    ("2nd century\nXII century\n3rd century", ["2nd century", "12th century", "3rd century"]),
+])
+def test_dates_are_found_and_normalized(content, expected):
+    assert parse_year_centuries(content) == expected
+
+
+@pytest.mark.parametrize("content", [
+    "",
+    "no dates here",
+    # Short numbers need an era
+    "79",
+    "chapter 12",
+    # Bare numbers that are not years
+    "page 123",
+    "p. 212",
+    "see #1200",
+    "it cost $1500",
+    "5000 soldiers marched",
+    "3000",
+    "300 years later",
+    "about 400 ships",
+    "1,500 men",
+    "pi is 3.1415",
+    "the 1960s",
+    # Centuries out of range
+    "30th century",
+])
+def test_non_dates_are_ignored(content):
+    assert parse_year_centuries(content) == []
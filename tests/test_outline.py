@@ -0,0 +1,43 @@
+import pytest
+
+from agents.outline import parse_outline
+
+
+def sections(outline):
+    return [(section.title, section.notes) for section in parse_outline(outline)]
+
+
+@pytest.mark.parametrize("outline, expected", [
+    # Markdown headings
+    ("## Causes\n## Course\n## Legacy", [("Causes", []), ("Course", []), ("Legacy", [])]),
+    ("# The Fall of Rome\n## Causes\n- taxes\n## Legacy", [("Causes", ["- taxes"]), ("Legacy", [])]),
+    ("# Causes\n## Taxes\n# Legacy", [("Causes", ["## Taxes"]), ("Legacy", [])]),
+    ("# Only a title\nSome guidance.", [("Only a title", ["Some guidance."])]),
+    # Numbered and bulleted lists
+    ("1. Causes\n2. Course\n3. Legacy", [("Causes", []), ("Course", []), ("Legacy", [])]),
+    ("1. Causes\n1.1 Taxes\n2. Legacy", [("Causes", ["1.1 Taxes"]), ("Legacy", [])]),
+    ("I. Causes\nII. Legacy", [("Causes", []), ("Legacy", [])]),
+    ("- Causes\n  - taxes\n- Legacy", [("Causes", ["- taxes"]), ("Legacy", [])]),
+    ("Article plan\n1. Causes\n2. Legacy", [("Causes", []), ("Legacy", [])]),
+    # Plain lines: titles with indented notes
+    ("Causes\n  taxes\n  wars\nLegacy\n  law", [("Causes", ["taxes", "wars"]), ("Legacy", ["law"])]),
+    ("Background\n  It covers the rise, the peak, and the fall of the empire.\nLegacy",
+     [("Background", ["It covers the rise, the peak, and the fall of the empire."]), ("Legacy", [])]),
+])
+def test_parse_outline_sections(outline, expected):
+    assert sections(outline) == expected
+
+
+@pytest.mark.parametrize("outline", [
+    None,
+    "",
+    "   \n\n",
+    # Guidance rather than an outline: written as a single section
+    "Focus on the economy\nInclude primary sources",
+    "Introduction\nCauses\nConsequences",
+    "Focus on the economy.\nMention the plague.",
+    "Write about the trade routes, the ports, and the merchants\n  keep it short",
+    "Cover the period from the founding of the city to the sack by the Visigoths in detail please",
+])
+def test_parse_outline_single_section(outline):
+    assert parse_outline(outline) == []
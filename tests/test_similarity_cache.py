@@ -0,0 +1,37 @@
+import pytest
+
+from agents.similarity_cache import canonical_query
+
+
+@pytest.mark.parametrize("queries", [
+    ("1066", "year 1066", "1066 AD", "AD 1066", "1066.", "What happened in 1066?", "events of the year 1066"),
+    ("XI century", "11th century", "11 century"),
+    ("1066 in Japan", "Japan 1066", "What happened in Japan in 1066?"),
+    ("1453, 1066", "1066 1453", "1066 and 1453"),
+])
+def test_equivalent_queries_share_a_key(queries):
+    assert len({canonical_query(query) for query in queries}) == 1
+
+
+@pytest.mark.parametrize("first, second", [
+    ("1066", "1066 in Japan"),
+    ("1066 in Japan", "1066 in China"),
+    ("1066", "1067"),
+    ("500", "500 BC"),
+    ("11th century", "11th century BC"),
+    ("the fall of Rome", "the fall of Constantinople"),
+])
+def test_different_queries_get_different_keys(first, second):
+    assert canonical_query(first) != canonical_query(second)
+
+
+@pytest.mark.parametrize("query, key", [
+    ("1066", "dates:1066 words:"),
+    ("1066 in Japan", "dates:1066 words:japan"),
+    ("XI century", "dates:11th century words:"),
+    ("500 BC", "dates:500 BC words:"),
+    ("The Fall of Rome", "words:the fall of rome"),
+    ("page 123", "words:page 123"),
+])
+def test_canonical_query(query, key):
+    assert canonical_query(query) == key
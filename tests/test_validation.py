@@ -0,0 +1,80 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from agents.validation import ValidationResult, issues_by_section, parse_validation, split_sections
+
+
+@pytest.mark.parametrize("reply, score", [
+    ('{"score": 4, "summary": "Accurate."}', 4),
+    ('{"score": "4", "summary": "Accurate."}', 4),
+    ('{"score": "4/5"}', 4),
+    ('{"score": "8 out of 10"}', 4),
+    ('{"score": 3.6}', 4),
+    ('{"rating": 2}', 2),
+    ('{"score": 0}', 1),
+    ('{"score": 7}', 5),
+    ('{"score": "high"}', None),
+    ('{"score": true}', None),
+    ('{"score": "3/0"}', None),
+    ('Here is my review:\n```json\n{"score": 2, "summary": "Thin."}\n```', 2),
+    ("The article is solid. I would give it 3/5.", 3),
+    ("Rating: 4. Well sourced.", 4),
+    ("Score: 9", None),
+    ("Looks fine to me.", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_validation_score(reply, score):
+    assert parse_validation(reply).score == score
+
+
+@pytest.mark.parametrize("reply, issues", [
+    ('{"score": 3, "issues": [{"section": "Causes", "problem": "No dates"}]}', [{"section": "Causes", "problem": "No dates"}]),
+    ('{"score": 3, "issues": ["Too short"]}', [{"section": "", "problem": "Too short"}]),
+    ('{"score": 3, "issues": "Too short"}', [{"section": "", "problem": "Too short"}]),
+    ('{"score": 3, "issues": null}', []),
+    ("Too short, 2/5.", []),
+])
+def test_parse_validation_issues(reply, issues):
+    assert parse_validation(reply).issues == issues
+
+
+def test_free_text_reply_is_kept_as_summary():
+    result = parse_validation("Mostly accurate, rating 4 out of 5.")
+    assert result.summary == "Mostly accurate, rating 4 out of 5."
+    assert "Mostly accurate" in result
+
+
+@pytest.mark.parametrize("score, threshold, passed", [(4, 4, True), (5, 4, True), (3, 4, False), (None, 1, False)])
+def test_passed(score, threshold, passed):
+    assert ValidationResult(score, "").passed(threshold) is passed
+
+
+def test_validation_result_survives_pickle_copy_and_json():
+    result = ValidationResult(3, "Thin.", [{"section": "Causes", "problem": "No dates"}])
+    for clone in (pickle.loads(pickle.dumps(result)), copy.deepcopy(result), copy.copy(result)):
+        assert isinstance(clone, ValidationResult)
+        assert clone == result
+        assert (clone.score, clone.summary, clone.issues) == (result.score, result.summary, result.issues)
+    assert json.loads(json.dumps({"validation": result}))["validation"] == str(result)
+
+
+def test_split_sections_round_trips():
+    text = "Intro text.\n\n## Causes\nTaxes.\n\n**Legacy**\nLasting."
+    sections = split_sections(text)
+    assert [heading for heading, _ in sections] == ["", "## Causes", "**Legacy**"]
+    assert "".join(chunk for _, chunk in sections) == text
+
+
+def test_issues_by_section_matches_headings_loosely():
+    sections = split_sections("## The Causes\nTaxes.\n## Legacy\nLasting.")
+    flagged, general = issues_by_section(sections, [
+        {"section": "Causes", "problem": "No dates"},
+        {"section": "", "problem": "Too short"},
+        {"section": "Conclusion", "problem": "Missing"},
+    ])
+    assert flagged == {0: [{"section": "Causes", "problem": "No dates"}]}
+    assert [issue["problem"] for issue in general] == ["Too short", "Missing"]
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Canonical form of extracted text: LF line endings, no trailing spaces, at most one blank line in a row"""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+class ExtractedTextCache:
+    """
+    Memoizes extracted upload text by SHA-256 of the raw bytes plus the extractor version.
+    A bounded in-memory LRU tier is backed by an optional on-disk store of the normalized text.
+    """
+
+    def __init__(self, max_entries=32, max_chars=64 * 1024 * 1024, cache_dir=None):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.cache_dir = cache_dir
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._memory = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(data, extension, extractor_version):
+        digest = hashlib.sha256()
+        digest.update(f"{extractor_version}:{extension}:".encode("utf-8"))
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def get(self, key):
+        """Returns the cached text for key, or None on a miss"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        if self.cache_dir and os.path.exists(self._path(key)):
+            with open(self._path(key), encoding="utf-8") as f:
+                text = f.read()
+            with self._lock:
+                self._remember(key, text)
+                self.hits += 1
+            return text
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, text):
+        with self._lock:
+            self._remember(key, text)
+        if self.cache_dir:
+            # Write then rename so a concurrent reader never sees a partial file
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, self._path(key))
+
+    def _remember(self, key, text):
+        if key in self._memory:
+            self._chars -= len(self._memory.pop(key))
+        if len(text) > self.max_chars:
+            return
+        self._memory[key] = text
+        self._chars += len(text)
+        while len(self._memory) > self.max_entries or self._chars > self.max_chars:
+            _, evicted = self._memory.popitem(last=False)
+            self._chars -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._memory), "chars": self._chars}
+
+
+# Shared by every Streamlit session in the process
+extracted_text_cache = ExtractedTextCache(cache_dir=os.getenv("EXTRACTION_CACHE_DIR"))
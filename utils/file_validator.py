@@ -1,6 +1,12 @@
-import streamlit as st
 from pathlib import Path
+import codecs
+import io
+import os
 import re
+import threading
+# Streamlit and the extraction libraries (pandas, PyPDF2, python-docx, the process pool)
+# are imported where they are used, so the CLI and workers load only what their files need
+from utils.content_cache import extracted_text_cache, normalize_text
 
 class FileValidator:
     """Validates uploaded files for security and content"""
@@ -10,6 +16,14 @@ class FileValidator:
     
     # Maximum file size in MB
     MAX_FILE_SIZE_MB = 10
+
+    # Bump whenever extraction output changes, so cached text is re-extracted
+    EXTRACTOR_VERSION = 2
+
+    # Streaming extraction settings
+    CSV_BATCH_ROWS = 1000
+    PDF_PROCESS_POOL_MIN_PAGES = 32
+    PDF_PAGES_PER_TASK = 16
     
     @staticmethod
     def validate_file(uploaded_file):
@@ -49,57 +63,181 @@ class FileValidator:
         Reads content from uploaded file
         Returns: (content, error_message)
         """
+        file_extension = Path(uploaded_file.name).suffix.lower()
+        if file_extension not in FileValidator.ALLOWED_EXTENSIONS:
+            return None, f"Unsupported file type: {file_extension}"
+
         try:
-            file_extension = Path(uploaded_file.name).suffix.lower()
-            
-            if file_extension in {'.txt', '.md'}:
-                # Read text files
-                content = uploaded_file.read().decode('utf-8')
-                return content, None
-            
-            elif file_extension == '.csv':
-                # Read CSV files
-                import pandas as pd
-                df = pd.read_csv(uploaded_file)
-                content = df.to_string()
-                return content, None
-            
-            elif file_extension == '.pdf':
-                # PDF reading requires PyPDF2 or pdfplumber
-                try:
-                    import PyPDF2
-                    pdf_reader = PyPDF2.PdfReader(uploaded_file)
-                    content = ""
-                    for page in pdf_reader.pages:
-                        content += page.extract_text() + "\n"
-                    return content, None
-                except ImportError:
-                    return None, "PDF support requires PyPDF2. Install with: pip install PyPDF2"
-            
-            elif file_extension == '.docx':
-                # DOCX reading requires python-docx
-                try:
-                    from docx import Document
-                    doc = Document(uploaded_file)
-                    content = "\n".join([para.text for para in doc.paragraphs])
-                    return content, None
-                except ImportError:
-                    return None, "DOCX support requires python-docx. Install with: pip install python-docx"
-            
-            else:
-                return None, f"Unsupported file type: {file_extension}"
-                
+            content = "".join(FileValidator.iter_file_content(uploaded_file))
+            return content, None
+        except ImportError as e:
+            return None, str(e)
         except UnicodeDecodeError:
             return None, "File encoding error. Please ensure the file is in UTF-8 format."
         except Exception as e:
             return None, f"Error reading file: {str(e)}"
 
+    @staticmethod
+    def read_path(path):
+        """
+        Reads a file from disk the same way as an upload (e.g. for the docs/ folder)
+        Returns: (content, error_message)
+        """
+        with open(path, "rb") as f:
+            local_file = io.BytesIO(f.read())
+        local_file.name = os.path.basename(path)
+        content, error = FileValidator.read_file_content(local_file)
+        return (normalize_text(content) if content else content), error
+
+    @staticmethod
+    def iter_path(path):
+        """
+        Streams a file from disk as normalized text pieces (see iter_file_content),
+        without holding the whole text; raises on unsupported or unreadable files
+        """
+        if Path(path).suffix.lower() not in FileValidator.ALLOWED_EXTENSIONS:
+            raise ValueError(f"Unsupported file type: {Path(path).suffix.lower()}")
+        with open(path, "rb") as f:
+            for piece in FileValidator.iter_file_content(f):
+                yield normalize_text(piece)
+
+    @staticmethod
+    def iter_file_content(uploaded_file, csv_batch_rows=None):
+        """
+        Lazily extracts text from uploaded file, yielding pieces in document order
+        (line blocks, CSV row batches, PDF pages, DOCX paragraphs) so callers can
+        start working before the whole file is parsed.
+        Raises ImportError when the optional parser for the format is missing.
+        """
+        file_extension = Path(uploaded_file.name).suffix.lower()
+        if hasattr(uploaded_file, "seek"):
+            uploaded_file.seek(0)
+
+        if file_extension in {'.txt', '.md'}:
+            yield from _iter_text(uploaded_file)
+
+        elif file_extension == '.csv':
+            yield from _iter_csv(uploaded_file, csv_batch_rows or FileValidator.CSV_BATCH_ROWS)
+
+        elif file_extension == '.pdf':
+            yield from _iter_pdf(uploaded_file)
+
+        elif file_extension == '.docx':
+            try:
+                from docx import Document
+            except ImportError:
+                raise ImportError("DOCX support requires python-docx. Install with: pip install python-docx")
+            doc = Document(uploaded_file)
+            for para in doc.paragraphs:
+                yield para.text + "\n"
+
+        else:
+            raise ValueError(f"Unsupported file type: {file_extension}")
+
+
+def _iter_text(uploaded_file, block_size=64 * 1024):
+    """Decodes UTF-8 text block by block, only yielding whole lines"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    remainder = ""
+    while True:
+        block = uploaded_file.read(block_size)
+        if not block:
+            break
+        text = remainder + decoder.decode(block)
+        cut = text.rfind("\n") + 1
+        remainder = text[cut:]
+        if cut:
+            yield text[:cut]
+    remainder += decoder.decode(b"", final=True)
+    if remainder:
+        yield remainder
+
+
+def _iter_csv(uploaded_file, batch_rows):
+    """Reads CSV in row batches and re-serializes them compactly (no index, no column padding)"""
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError("CSV support requires pandas. Install with: pip install pandas")
+    for i, chunk in enumerate(pd.read_csv(uploaded_file, chunksize=batch_rows)):
+        yield chunk.to_csv(index=False, header=(i == 0))
+
+
+def _extract_pdf_pages(path, start, stop):
+    """Worker for the PDF process pool: extracts pages [start, stop) from the PDF at path"""
+    import PyPDF2
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [(reader.pages[i].extract_text() or "") + "\n" for i in range(start, stop)]
+
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool():
+    """
+    The process pool shared by every PDF extraction. Workers are spawned rather than
+    forked: forking a multithreaded server (Streamlit) can deadlock the children.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            _pdf_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def _iter_pdf(uploaded_file):
+    try:
+        import PyPDF2
+    except ImportError:
+        raise ImportError("PDF support requires PyPDF2. Install with: pip install PyPDF2")
+    import tempfile
+    data = uploaded_file.read()
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+
+    if page_count < FileValidator.PDF_PROCESS_POOL_MIN_PAGES:
+        for page in reader.pages:
+            yield (page.extract_text() or "") + "\n"
+        return
+
+    # Big documents: parse page ranges in worker processes, which read the PDF from
+    # a temporary file instead of each receiving a pickled copy of it
+    step = FileValidator.PDF_PAGES_PER_TASK
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(data)
+    del data, reader
+    futures = []
+    try:
+        pool = _get_pdf_pool()
+        futures = [pool.submit(_extract_pdf_pages, tmp.name, start, min(start + step, page_count))
+                   for start in range(0, page_count, step)]
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Stopped early: drop the ranges not started yet; ones already running keep the file until they finish
+        running = [future for future in futures if not future.cancel() and not future.done()]
+        if running:
+            threading.Thread(target=_unlink_when_done, args=(tmp.name, running), daemon=True).start()
+        else:
+            os.unlink(tmp.name)
+
+
+def _unlink_when_done(path, futures):
+    from concurrent.futures import wait
+    wait(futures)
+    os.unlink(path)
+
 
 def file_upload_section(label="Upload a file", help_text=None, key=None):
     """
     Creates a file upload section with validation
     Returns: (content, filename) or (None, None) if invalid
     """
+    import streamlit as st
     if help_text is None:
         help_text = f"Allowed types: {', '.join(FileValidator.ALLOWED_EXTENSIONS)}. Max size: {FileValidator.MAX_FILE_SIZE_MB} MB"
     
@@ -118,12 +256,22 @@ def file_upload_section(label="Upload a file", help_text=None, key=None):
             st.error(f"❌ {message}")
             return None, None
         
-        # Read content
-        content, error = FileValidator.read_file_content(uploaded_file)
-        
-        if error:
-            st.error(f"❌ {error}")
-            return None, None
+        # Read content, reusing earlier extractions of the same bytes across reruns
+        cache_key = extracted_text_cache.make_key(
+            uploaded_file.getvalue(),
+            Path(uploaded_file.name).suffix.lower(),
+            FileValidator.EXTRACTOR_VERSION
+        )
+        content = extracted_text_cache.get(cache_key)
+        if content is None:
+            content, error = FileValidator.read_file_content(uploaded_file)
+
+            if error:
+                st.error(f"❌ {error}")
+                return None, None
+
+            content = normalize_text(content)
+            extracted_text_cache.set(cache_key, content)
         
         st.success(f"✅ File '{uploaded_file.name}' loaded successfully ({uploaded_file.size / 1024:.2f} KB)")
         return content, uploaded_file.name
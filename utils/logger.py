@@ -1,10 +1,134 @@
 from loguru import logger
-import sys
+import atexit
+import hashlib
+import json
 import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
 
 if not os.path.exists("logs"):
     os.makedirs("logs")
 
+# Longest message kept verbatim in a log record; longer ones are cut and hashed
+MAX_MESSAGE_CHARS = 2000
+
+
+def compact_payload(text, limit=MAX_MESSAGE_CHARS):
+    """Truncates long text and appends its length and a short hash so records stay small but traceable"""
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    digest = hashlib.sha1(text.encode("utf-8", "replace")).hexdigest()[:12]
+    return f"{text[:limit]}... [{len(text)} chars, sha1 {digest}]"
+
+
+class BackgroundSink:
+    """
+    loguru sink that hands records to a writer thread through a bounded queue,
+    so the logging call itself never blocks on I/O.
+    Under backpressure DEBUG records are dropped first (once the queue is half full),
+    then everything; the number of dropped records is logged once the writer catches up.
+    """
+
+    def __init__(self, writer, max_queue=10000, debug_watermark=0.5):
+        # Not called "write": loguru would then treat the sink as a text stream
+        self.writer = writer
+        self.max_queue = max_queue
+        self.debug_watermark = debug_watermark
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def __call__(self, message):
+        record = message.record
+        if record["level"].no <= 10 and self._queue.qsize() >= self.max_queue * self.debug_watermark:
+            self.dropped += 1
+            return
+        # Only references are queued here; formatting and truncation happen on the writer thread
+        try:
+            self._queue.put_nowait((record["time"], record["level"].name, record["name"], record["line"],
+                                    record["message"], dict(record["extra"])))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            timestamp, level, name, line, message, extra = item
+            entry = {"ts": timestamp.isoformat(), "level": level, "src": f"{name}:{line}", "msg": compact_payload(message)}
+            if extra:
+                entry["extra"] = {key: compact_payload(value, 200) for key, value in extra.items()}
+            try:
+                if self.dropped and self._queue.empty():
+                    dropped, self.dropped = self.dropped, 0
+                    self.writer({"ts": entry["ts"], "level": "WARNING", "src": __name__,
+                                 "msg": f"log queue overflow, dropped {dropped} records"})
+                self.writer(entry)
+                # Flush once the burst is written rather than after every record
+                if self._queue.empty() and hasattr(self.writer, "flush"):
+                    self.writer.flush()
+            except Exception as e:
+                sys.stderr.write(f"log writer error: {e}\n")
+
+    def stop(self, timeout=2.0):
+        """Flushes what is queued (up to timeout) and stops the writer"""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+class JsonlFileWriter:
+    """Appends one JSON object per line, rotating at max_bytes and deleting rotated files older than retention_days"""
+
+    def __init__(self, path, max_bytes=1024 * 1024, retention_days=10):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.retention_seconds = retention_days * 24 * 3600
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def flush(self):
+        self._file.flush()
+
+    def _rotate(self):
+        self._file.close()
+        base, extension = os.path.splitext(self.path)
+        os.replace(self.path, f"{base}.{datetime.now().strftime('%Y-%m-%d_%H-%M-%S_%f')}{extension}")
+        self._file = open(self.path, "a", encoding="utf-8")
+        directory = os.path.dirname(self.path) or "."
+        cutoff = time.time() - self.retention_seconds
+        for name in os.listdir(directory):
+            rotated = os.path.join(directory, name)
+            if (name.startswith(os.path.basename(base) + ".") and name.endswith(extension)
+                    and rotated != self.path and os.path.getmtime(rotated) < cutoff):
+                os.remove(rotated)
+
+
+class StdoutWriter:
+    def __call__(self, entry):
+        sys.stdout.write(f"\033[32m{entry['ts']}\033[0m {entry['msg']}\n")
+
+    def flush(self):
+        sys.stdout.flush()
+
+
+_stdout_sink = BackgroundSink(StdoutWriter())
+_file_sink = BackgroundSink(JsonlFileWriter("logs/multi_agent_system.jsonl"))
+
 logger.remove()
-logger.add(sys.stdout,level="INFO",format="<green>{time}</green> <level>{message}</level>")
-logger.add("logs/multi_agent_system.log",rotation="1 MB",retention="10 days", level="DEBUG",format= "{time} {level} {message}")
\ No newline at end of file
+logger.add(_stdout_sink, level="INFO")
+logger.add(_file_sink, level="DEBUG")
+atexit.register(_stdout_sink.stop)
+atexit.register(_file_sink.stop)